@@ -1,5 +1,5 @@
 import json
-from eval_utils import get_embedding
+from eval_utils import embed
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from tqdm import tqdm
@@ -30,8 +30,8 @@ def evaluate_retrieval_by_source(json_path, top_k=3, similarity_threshold=0.65,
             continue
 
         source_metrics[source]["total"] += 1
-        query_emb = get_embedding(query)
-        chunk_embs = [get_embedding(c) for c in chunks[:top_k]]
+        query_emb = embed(query)
+        chunk_embs = embed(chunks[:top_k])
         sims = [cosine(query_emb, emb) for emb in chunk_embs]
 
         if sims:
@@ -29,6 +29,18 @@ from chat_assistant import ChatAssistant
 # UI CONFIG 
 st.set_page_config(page_title="CAP Assistant", layout="wide")
 
+
+# One warm assistant per model, shared by every session of this server process
+@st.cache_resource(show_spinner="Loading assistant models...")
+def get_assistant(model_name):
+    assistant = ChatAssistant(model_name=model_name)
+    assistant.warm_up()
+    return assistant
+
+
+# Warm up the default model at startup so the first question is not a cold start
+get_assistant(ChatAssistant.LOCAL_MODEL)
+
 # Load image and convert to base64
 logo_path = os.path.join(current_dir, "static", "logo.webp")
 with open(logo_path, "rb") as f:
@@ -55,42 +67,7 @@ with st.form("qa_form"):
     model_name = ChatAssistant.LOCAL_MODEL if model_choice.startswith("Ollama") else ChatAssistant.CLOUD_MODEL
     submit = st.form_submit_button("Ask")
 
-# PROCESS QUESTION 
-if submit and question:
-    if source == "User Manual":
-        source_key = "cap_manual_v3"
-    elif source == "Support Tickets":
-        source_key = "jira_tickets_hybrid"
-    else:
-        source_key = "multi"
-
-    assistant = ChatAssistant(model_name=model_name)
-    try:
-        result = assistant.ask(question, source=source_key, return_chunks=True)
-        st.session_state.response = result
-    except Exception as e:
-        st.session_state.response = None
-        st.error(f" Error: {e}")
-
-#  DISPLAY RESPONSE 
-if st.session_state.response:
-    answer = st.session_state.response["answer"]
-    references = st.session_state.response["references"]
-    chunks = st.session_state.response["chunks"]
-
-    # Extract and hide <think> section
-    if answer.startswith("<think>"):
-        end_of_think = answer.find("</think>") + len("</think>")
-        think_section = answer[:end_of_think]
-        main_answer = answer[end_of_think:].strip()
-    else:
-        think_section = ""
-        main_answer = answer
-
-    with st.expander("🔍 Internal Reasoning (Hidden)"):
-        st.markdown(f"```text\n{think_section}\n```")
-
-    st.markdown(main_answer)
+def render_references(references, chunks):
     st.markdown("---")
     st.markdown("### 📚 Retrieved References")
 
@@ -127,5 +104,64 @@ if st.session_state.response:
                     unsafe_allow_html=True
                 )
 
+
+def stream_response(assistant, question, source_key):
+    """
+    Render the answer while it is generated: references appear as soon as
+    retrieval finishes, then reasoning and answer text fill in token by token.
+    """
+    # Layout first, so the references land below the answer that is still streaming
+    reasoning_slot = st.expander("🔍 Internal Reasoning (Hidden)").empty()
+    answer_slot = st.empty()
+    references_box = st.container()
+
+    response = {"answer": "", "reasoning": "", "references": [], "chunks": []}
+    for event in assistant.ask_stream(question, source=source_key):
+        if event["type"] == "retrieval":
+            response["references"] = event["references"]
+            response["chunks"] = event["chunks"]
+            with references_box:
+                render_references(response["references"], response["chunks"])
+        elif event["type"] == "reasoning":
+            response["reasoning"] += event["text"]
+            reasoning_slot.markdown(f"```text\n{response['reasoning'].strip()}\n```")
+        elif event["type"] == "answer":
+            response["answer"] += event["text"]
+            answer_slot.markdown(response["answer"].strip())
+        elif event["type"] == "error":
+            st.error(f" Error: {event['text']}")
+    response["answer"] = response["answer"].strip()
+    response["reasoning"] = response["reasoning"].strip()
+    return response
+
+
+def show_response(response):
+    with st.expander("🔍 Internal Reasoning (Hidden)"):
+        st.markdown(f"```text\n{response['reasoning']}\n```")
+
+    st.markdown(response["answer"])
+    render_references(response["references"], response["chunks"])
+
+
+# PROCESS QUESTION 
+if submit and question:
+    if source == "User Manual":
+        source_key = "cap_manual_v3"
+    elif source == "Support Tickets":
+        source_key = "jira_tickets_hybrid"
+    else:
+        source_key = "multi"
+
+    assistant = get_assistant(model_name)
+    try:
+        st.session_state.response = stream_response(assistant, question, source_key)
+    except Exception as e:
+        st.session_state.response = None
+        st.error(f" Error: {e}")
+
+#  DISPLAY RESPONSE (reruns after the streamed answer)
+elif st.session_state.response:
+    show_response(st.session_state.response)
+
 st.markdown("---")
 st.markdown("<div style='text-align: center;'>Built with 💙 for BME Bsc Thesis Project</div>", unsafe_allow_html=True)
@@ -0,0 +1,94 @@
+# generation/answer_cache.py
+"""
+Semantic cache of generated answers.
+
+Answers are grouped by (source, model). A new question is a hit when its query
+embedding has cosine similarity of at least `threshold` with a cached question
+of the same group, so rephrasings of a frequent question skip routing,
+retrieval and generation. Entries expire after `ttl` seconds, the least
+recently used ones are evicted beyond `maxsize`, and an entry is dropped as soon
+as the index version of a collection it was answered from changes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared.config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL
+from shared.index_version import get_index_version
+
+# Collections whose reindexing invalidates answers for each ChatAssistant source
+SOURCE_COLLECTIONS = {
+    "cap_manual_v3": ("cap_manual_v3",),
+    "jira_tickets_hybrid": ("jira_tickets_hybrid",),
+    "multi": ("cap_manual_v3", "jira_tickets_hybrid"),
+}
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # entry id -> (group, unit query vector, versions, expiry, value), oldest first
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _versions(source: str) -> Tuple[str, ...]:
+        return tuple(get_index_version(c) for c in SOURCE_COLLECTIONS.get(source, (source,)))
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _drop_stale(self, now: float) -> None:
+        current = {}
+        for entry_id, (group, _, versions, expires, _) in list(self._entries.items()):
+            source = group[0]
+            if source not in current:
+                current[source] = self._versions(source)
+            if expires < now or versions != current[source]:
+                del self._entries[entry_id]
+
+    def get(self, source: str, model: str, query_vector: Sequence[float]) -> Optional[Dict]:
+        """Return the cached answer of the most similar question above the threshold, or None."""
+        group = (source, model)
+        query = self._unit(query_vector)
+        with self._lock:
+            self._drop_stale(time.monotonic())
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry[0] == group]
+            if ids:
+                matrix = np.stack([self._entries[entry_id][1] for entry_id in ids])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self.hits += 1
+                    return self._entries[ids[best]][4]
+            self.misses += 1
+            return None
+
+    def put(self, source: str, model: str, query_vector: Sequence[float], value: Dict) -> None:
+        entry = ((source, model), self._unit(query_vector), self._versions(source), time.monotonic() + self.ttl, value)
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,57 @@
+# generation/async_runtime.py
+"""
+Event-loop plumbing for the async request pipeline.
+
+`run_sync` lets the blocking APIs (ChatAssistant.ask, Streamlit callbacks, the
+evaluation scripts) drive the async implementations on one long-lived
+background loop, so HTTP connection pools are reused across calls instead of
+being rebuilt by a fresh `asyncio.run` each time.
+
+`loop_local` keeps one instance of an async client per event loop. httpx and
+Qdrant async clients are bound to the loop they were first used on, so an app
+that runs its own loop and the background loop each get their own copy.
+"""
+import asyncio
+import threading
+import weakref
+
+_lock = threading.Lock()
+_loop = None
+_loop_local = weakref.WeakKeyDictionary()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting its thread on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-runtime", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro, timeout=None):
+    """Run `coro` on the background loop and block the calling thread for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+def loop_local(key, factory):
+    """Return the object stored under `key` for the running loop, creating it with `factory()`."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        objects = _loop_local.setdefault(loop, {})
+        if key not in objects:
+            objects[key] = factory()
+        return objects[key]
+
+
+def iterate_sync(agen):
+    """Iterate the async generator `agen` from blocking code, one item per background-loop round trip."""
+    try:
+        while True:
+            try:
+                yield run_sync(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(agen.aclose())
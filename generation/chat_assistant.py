@@ -5,14 +5,25 @@ indexing_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "I
 if indexing_path not in sys.path:
     sys.path.insert(0, indexing_path)
 
-from multi_source_retrieval.multi_source_retriever import MultiSourceRetriever
-from multi_source_retrieval.routing_controller import RoutingController
-from qdrant_client import QdrantClient
-from query_ollama_llm import query_ollama
-from query_openai import query_openai
+import asyncio
 
-from generation.jira_retriever import JiraHybridRetriever
-from generation.doc_retriever import SoftHybridRetriever
+import logging
+
+from query_ollama_llm import aquery_ollama, get_ollama_client
+from query_openai import aquery_openai, astream_openai
+
+from generation.components import (
+    get_manual_retriever,
+    get_jira_retriever,
+    get_multi_source_retriever,
+    get_answer_cache,
+)
+from generation.query_embedding_utils import get_embedding
+from generation.async_runtime import run_sync, iterate_sync
+from generation.think_filter import ThinkSplitter
+from shared.config import ANSWER_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
 
 class ChatAssistant:
     LOCAL_MODEL = "deepseek-r1:1.5b"
@@ -22,12 +33,23 @@ class ChatAssistant:
         self.qdrant_port = 6333
         self.model_name = model_name
         self.sources = sources or ["cap_manual_v3", "jira_tickets_hybrid"]
+        # Retrievers, clients and models are shared process-wide through the component registry
         self.retrievers = {
-            "cap_manual_v3": SoftHybridRetriever(collection_name="cap_manual_v3", host=self.qdrant_host, port=self.qdrant_port),
-            "jira_tickets_hybrid": JiraHybridRetriever(collection_name="jira_tickets_hybrid", host=self.qdrant_host, port=self.qdrant_port, model_name=self.model_name),
-            "multi": MultiSourceRetriever(model_name=self.model_name),
-
+            "cap_manual_v3": get_manual_retriever(collection_name="cap_manual_v3", host=self.qdrant_host, port=self.qdrant_port),
+            "jira_tickets_hybrid": get_jira_retriever(collection_name="jira_tickets_hybrid", host=self.qdrant_host, port=self.qdrant_port, model_name=self.model_name),
+            "multi": get_multi_source_retriever(model_name=self.model_name, host=self.qdrant_host, port=self.qdrant_port),
         }
+        self.answer_cache = get_answer_cache() if ANSWER_CACHE_ENABLED else None
+
+    def warm_up(self):
+        """
+        Run one pass through the embedder, reranker and router so their weights are
+        loaded and initialized before the first real question arrives.
+        """
+        probe = "How do I log in to the CPI Automation Portal?"
+        get_embedding(probe)
+        self.retrievers["jira_tickets_hybrid"].reranker.rerank(probe, [{"text": probe}])
+        self.retrievers["multi"].routing.warm_up()
 
     #Helper method
     def is_step_question(self, question):
@@ -105,35 +127,134 @@ class ChatAssistant:
         Answer:"""
 
     def ask(self, question, source="cap_manual_v3", return_chunks=False):
+        """Blocking wrapper around `aask`, run on the shared background event loop."""
+        return run_sync(self.aask(question, source=source, return_chunks=return_chunks))
+
+    async def _aretrieve_and_prompt(self, question, source, query_vector=None):
+        """Retrieve context for `question` from `source` and build the matching prompt."""
         retriever = self.retrievers.get(source)
         if not retriever:
             raise ValueError(f"Invalid source {source}. Must be one of {list(self.retrievers.keys())}.")
-        context, references, chunks = retriever.retrieve(question)
+        if source == "multi":
+            # Route once with the retriever's own controller and reuse the decision for the prompt
+            if query_vector is None:
+                query_vector = await asyncio.to_thread(get_embedding, question)
+            routes = await asyncio.to_thread(retriever.routing.route, question, query_vector)
+            context, references, chunks = await retriever.aretrieve(question, sources=routes, query_vector=query_vector)
+        elif source == "cap_manual_v3":
+            context, references, chunks = await retriever.aretrieve(question, query_vector=query_vector)
+        else:
+            context, references, chunks = await retriever.aretrieve(question)
         if source == "cap_manual_v3":
             prompt = self.build_prompt_for_manual(question, context)
         elif source == "jira_tickets_hybrid":
             prompt = self.build_prompt_for_tickets(question, context)
         elif source == "multi":
-            routing = RoutingController()
-            if "cap_manual_v3" in routing.route(question):
+            if "cap_manual_v3" in routes:
                 prompt = self.build_prompt_for_manual(question, context)
             else:
                 prompt = self.build_prompt_for_tickets(question, context)
         else:
             raise ValueError(f"Invalid source {source}")
-        if self.model_name.startswith("gpt"):
-            answer = query_openai(prompt, model=self.model_name)
-        else:
-            answer = query_ollama(prompt, model=self.model_name)
-            
-        reference_block = "\n\nReferences used:\n" + "\n".join(f"- {r}" for r in references)
-        final_answer = (answer + reference_block) if answer else "No response generated."
+        return prompt, references, chunks
 
-        if return_chunks:
-            return {
+    @staticmethod
+    def _reference_block(references):
+        return "\n\nReferences used:\n" + "\n".join(f"- {r}" for r in references)
+
+    async def _cached_answer(self, question, source):
+        """
+        Look `question` up in the semantic answer cache. Returns the cached result
+        (or None) and the query embedding, which the retrieval path reuses on a miss.
+        """
+        if self.answer_cache is None:
+            return None, None
+        query_vector = await asyncio.to_thread(get_embedding, question)
+        cached = self.answer_cache.get(source, self.model_name, query_vector)
+        if cached is not None:
+            logger.info(f"Answer cache hit for {source}/{self.model_name} | {self.answer_cache.stats()}")
+        return cached, query_vector
+
+    def _store_answer(self, source, query_vector, answer, references, chunks):
+        # Failed generations are never cached, so the next ask retries them
+        if self.answer_cache is None or not answer or answer.startswith("[OpenAI Error]"):
+            return
+        self.answer_cache.put(source, self.model_name, query_vector, {
+            "answer": answer + self._reference_block(references),
+            "references": references,
+            "chunks": chunks
+        })
+
+    async def aask(self, question, source="cap_manual_v3", return_chunks=False):
+        result, query_vector = await self._cached_answer(question, source)
+        if result is None:
+            prompt, references, chunks = await self._aretrieve_and_prompt(question, source, query_vector)
+            if self.model_name.startswith("gpt"):
+                answer = await aquery_openai(prompt, model=self.model_name)
+            else:
+                answer = await aquery_ollama(prompt, model=self.model_name)
+            self._store_answer(source, query_vector, answer, references, chunks)
+
+            final_answer = (answer + self._reference_block(references)) if answer else "No response generated."
+            result = {
                 "answer": final_answer,
                 "references": references,
                 "chunks": chunks
             }
+
+        if return_chunks:
+            return result
+        else:
+            return result["answer"]
+
+    def ask_stream(self, question, source="cap_manual_v3"):
+        """Blocking generator over the events of `aask_stream`."""
+        return iterate_sync(self.aask_stream(question, source=source))
+
+    async def aask_stream(self, question, source="cap_manual_v3"):
+        """
+        Stream an answer as events, so the UI can render while the LLM generates:
+
+        - {"type": "retrieval", "references": [...], "chunks": [...]} once, before generation
+        - {"type": "reasoning", "text": ...} for text inside the model's <think> block
+        - {"type": "answer", "text": ...} for answer text, ending with the reference block
+        - {"type": "error", "text": ...} if the LLM stream fails
+        """
+        cached, query_vector = await self._cached_answer(question, source)
+        if cached is not None:
+            yield {"type": "retrieval", "references": cached["references"], "chunks": cached["chunks"]}
+            splitter = ThinkSplitter()
+            for kind, text in splitter.feed(cached["answer"]) + splitter.flush():
+                yield {"type": kind, "text": text}
+            return
+
+        prompt, references, chunks = await self._aretrieve_and_prompt(question, source, query_vector)
+        yield {"type": "retrieval", "references": references, "chunks": chunks}
+
+        if self.model_name.startswith("gpt"):
+            tokens = astream_openai(prompt, model=self.model_name)
+        else:
+            tokens = get_ollama_client().astream(prompt, model=self.model_name)
+
+        splitter = ThinkSplitter()
+        answered = False
+        raw_answer = []
+        try:
+            async for token in tokens:
+                raw_answer.append(token)
+                for kind, text in splitter.feed(token):
+                    answered = answered or (kind == "answer" and bool(text.strip()))
+                    yield {"type": kind, "text": text}
+            for kind, text in splitter.flush():
+                answered = answered or (kind == "answer" and bool(text.strip()))
+                yield {"type": kind, "text": text}
+        except Exception as e:
+            logger.error(f"LLM stream failed: {e}")
+            yield {"type": "error", "text": str(e)}
+            return
+
+        if answered:
+            self._store_answer(source, query_vector, "".join(raw_answer), references, chunks)
+            yield {"type": "answer", "text": self._reference_block(references)}
         else:
-            return final_answer
\ No newline at end of file
+            yield {"type": "answer", "text": "No response generated."}
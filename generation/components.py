@@ -0,0 +1,97 @@
+# generation/components.py
+"""
+Process-wide registry of the heavy generation components.
+
+Qdrant clients, retrievers, the query expander, the cross-encoder and the
+zero-shot router are each created once per process (per configuration) and
+injected wherever they are needed, so ChatAssistant and MultiSourceRetriever
+share the same instances instead of building their own copies.
+"""
+import os
+import sys
+import threading
+
+generation_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(generation_dir)
+for path in (project_root, generation_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+_lock = threading.RLock()
+_components = {}
+
+
+def _get_or_create(key, factory):
+    with _lock:
+        if key not in _components:
+            _components[key] = factory()
+        return _components[key]
+
+
+def get_async_qdrant_client(host="localhost", port=6333):
+    """
+    Async Qdrant client for the running event loop (one per loop, see async_runtime).
+    Retrievers keep only host and port and look the client up on every call, so the
+    same retriever works from the background loop and from an app's own loop.
+    """
+    from qdrant_client import AsyncQdrantClient
+    from generation.async_runtime import loop_local
+    return loop_local(("qdrant", host, port), lambda: AsyncQdrantClient(host=host, port=port))
+
+
+def get_reranker():
+    from jira_reranker import CrossEncoderReranker
+    return _get_or_create(("reranker",), lambda: CrossEncoderReranker(top_k=5))
+
+
+def get_query_expander(model_name):
+    from query_expander import QueryExpander
+    return _get_or_create(("query_expander", model_name), lambda: QueryExpander(model_name=model_name))
+
+
+def get_answer_cache():
+    from generation.answer_cache import SemanticAnswerCache
+    return _get_or_create(("answer_cache",), SemanticAnswerCache)
+
+
+def get_routing_controller():
+    from multi_source_retrieval.routing_controller import RoutingController
+    return _get_or_create(("routing",), RoutingController)
+
+
+def get_manual_retriever(collection_name="cap_manual_v3", host="localhost", port=6333):
+    from generation.doc_retriever import SoftHybridRetriever
+    return _get_or_create(
+        ("manual_retriever", collection_name, host, port),
+        lambda: SoftHybridRetriever(collection_name=collection_name, host=host, port=port),
+    )
+
+
+def get_jira_retriever(collection_name="jira_tickets_hybrid", host="localhost", port=6333, model_name="deepseek-r1:1.5b"):
+    from generation.jira_retriever import JiraHybridRetriever
+    return _get_or_create(
+        ("jira_retriever", collection_name, host, port, model_name),
+        lambda: JiraHybridRetriever(
+            collection_name=collection_name,
+            host=host,
+            port=port,
+            model_name=model_name,
+            query_expander=get_query_expander(model_name),
+            reranker=get_reranker(),
+        ),
+    )
+
+
+def get_multi_source_retriever(model_name="deepseek-r1:1.5b", host="localhost", port=6333):
+    from multi_source_retrieval.multi_source_retriever import MultiSourceRetriever
+    return _get_or_create(
+        ("multi_retriever", host, port, model_name),
+        lambda: MultiSourceRetriever(
+            model_name=model_name,
+            retrievers={
+                "cap_manual_v3": get_manual_retriever(host=host, port=port),
+                "jira_tickets_hybrid": get_jira_retriever(host=host, port=port, model_name=model_name),
+            },
+            routing=get_routing_controller(),
+        ),
+    )
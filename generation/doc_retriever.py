@@ -1,13 +1,16 @@
 # generation/retriever.py
 
-import torch
+import asyncio
 import numpy as np
 import json
 import os
 import logging
 
-from qdrant_client import QdrantClient
+from qdrant_client.models import Filter, FieldCondition, MatchAny
 from generation.query_embedding_utils  import get_embedding
+from generation.section_index import SectionTitleIndex
+from generation.components import get_async_qdrant_client
+from generation.async_runtime import run_sync
 
 
 # Setup logger 
@@ -32,82 +35,95 @@ class SoftHybridRetriever:
     MIN_SIMILARITY_THRESHOLD = 0.55
     MARGIN_THRESHOLD = 0.04
 
-    def __init__(self, collection_name="cap_manual_v3", host="localhost", port=6333):
+    def __init__(self, collection_name="cap_manual_v3", host="localhost", port=6333, fetch_vectors=False):
         self.collection_name = collection_name
-        self.client = QdrantClient(host=host, port=port)
+        # Qdrant already returns the cosine score on a COSINE collection, so chunk
+        # vectors are only pulled when the explicit vector rerank is requested
+        self.fetch_vectors = fetch_vectors
+        # Only the address is kept; see get_async_qdrant_client
+        self.host = host
+        self.port = port
         self.metadata = metadata_nodes
 
         self.section_hierarchy = {}
         self.section_data = {}
-        self.section_embeddings = {}
+        self.section_index = SectionTitleIndex.load_or_build(self.metadata, metadata_path)
 
         for node in self.metadata:
             section_id = node["id"]
             self.section_data[section_id] = node
-            self.section_embeddings[section_id] = get_embedding(node["title"])
             parent = node.get("parent_id")
             if parent not in self.section_hierarchy:
                 self.section_hierarchy[parent] = []
             self.section_hierarchy[parent].append(section_id)
 
-    def retrieve(self, question, top_k=10, score_threshold=0.5):
+    def retrieve(self, question, top_k=10, score_threshold=0.5, query_vector=None):
+        """Blocking `aretrieve`, run on the shared background event loop."""
+        return run_sync(self.aretrieve(question, top_k=top_k, score_threshold=score_threshold, query_vector=query_vector))
+
+    async def aretrieve(self, question, top_k=10, score_threshold=0.5, query_vector=None):
+        """
+        Search the manual: the embedding runs in a worker thread and the Qdrant
+        searches are awaited on the AsyncQdrantClient of the running loop.
+        """
         logger.info(f"🔍 Retrieval started for question: {question}")
-        query_vector = get_embedding(question)
+        if query_vector is None:
+            query_vector = await asyncio.to_thread(get_embedding, question)
 
         if len(query_vector) != 768:
             return "Invalid query embedding", [], []
 
-        # Step 1: Run full search (no filter)
-        results = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=("default", query_vector),
-            limit=top_k * 5,  # Search wide
-            with_payload=True,
-            with_vectors=True
-        )
+        # Step 1: Get hierarchy-based boosted IDs
+        section_filter = self._boosted_section_filter(query_vector)
+
+        # Step 2: Search inside the boosted sections, falling back to the whole manual
+        results = []
+        if section_filter is not None:
+            results = await self._asearch(query_vector, top_k, section_filter=section_filter)
+            if not results:
+                logger.info("No hits inside boosted sections — falling back to unfiltered search.")
 
         if not results:
-            logger.warning("❌ No search results at all.")
-            return "No results", [], []
+            results = await self._asearch(query_vector, top_k)
 
-        # Step 2: Get hierarchy-based boosted IDs
-        top_section = None
-        related_ids = []
-        boosted_ids = set()
-        
+        return self._build_context(results, query_vector)
+
+    def _boosted_section_filter(self, query_vector):
+        """Filter on the best matching section and its parent/children, or None if no section matches."""
         relevant_sections = self._find_relevant_sections(query_vector)
-        if relevant_sections:
-            top_section = relevant_sections[0]
-            related_ids = self._get_related_sections(top_section["id"])
-            boosted_ids = set([top_section["id"]] + related_ids)
-            logger.info(f"🏷️ Boosted sections: {boosted_ids}")
+        if not relevant_sections:
+            return None
+        top_section = relevant_sections[0]
+        related_ids = self._get_related_sections(top_section["id"])
+        boosted_ids = set([top_section["id"]] + related_ids)
+        logger.info(f"🏷️ Boosted sections: {boosted_ids}")
+        return self._section_filter(boosted_ids)
+
+    def _build_context(self, results, query_vector):
+        if not results:
+            logger.warning("❌ No search results at all.")
+            return "No results", [], []
 
         # Step 3: Filter and rerank results manually
-        reranked = []
-        query_emb = torch.nn.functional.normalize(torch.tensor(query_vector, dtype=torch.float), dim=0)
-
+        candidates = []
         for r in results:
-            payload = r.payload
-            text = payload.get("text", "").strip()
-            section_id = str(payload.get("section_id"))
+            text = r.payload.get("text", "").strip()
 
-            if not text or "default" not in r.vector:
+            if not text or (self.fetch_vectors and not self._has_vector(r)):
                 continue
 
-            if boosted_ids and section_id not in boosted_ids:
-                continue  # Skip unboosted
+            candidates.append(r)
 
-            chunk_emb = torch.tensor(r.vector["default"], dtype=torch.float)
-            chunk_emb = torch.nn.functional.normalize(chunk_emb, dim=0)
-
-            sim_score = torch.nn.functional.cosine_similarity(query_emb, chunk_emb, dim=0).item()
-            final_score = 0.6 * r.score + 0.4 * sim_score
-
-            reranked.append({
-                "text": text,
-                "citation": f"Page {payload.get('page_start', 'N/A')} | Title: {payload.get('title', 'Unknown')}",
-                "score": final_score
-            })
+        reranked = []
+        if candidates:
+            scores = self._score_candidates(candidates, query_vector)
+            for r, final_score in zip(candidates, scores.tolist()):
+                payload = r.payload
+                reranked.append({
+                    "text": payload.get("text", "").strip(),
+                    "citation": f"Page {payload.get('page_start', 'N/A')} | Title: {payload.get('title', 'Unknown')}",
+                    "score": final_score
+                })
 
         if not reranked:
             return "No relevant content found.", [], []
@@ -123,77 +139,91 @@ class SoftHybridRetriever:
         return context, citations, texts
     
         
-    def _find_relevant_sections(self, query_vector, threshold=0.5):
-        query_tensor = torch.tensor(query_vector)
+    async def _asearch(self, query_vector, limit, section_filter=None):
+        client = get_async_qdrant_client(self.host, self.port)
+        response = await client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            using="default",
+            query_filter=section_filter,
+            limit=limit,
+            with_payload=True,
+            with_vectors=self.fetch_vectors
+        )
+        return response.points
+
+    @staticmethod
+    def _section_filter(section_ids):
+        # Served by the keyword payload index UserManualIndexer creates on section_id
+        return Filter(must=[
+            FieldCondition(key="section_id", match=MatchAny(any=sorted(str(s) for s in section_ids)))
+        ])
+
+    def _find_relevant_sections(self, query_vector, threshold=0.5, top_k=10):
+        rows, scores = self.section_index.search(query_vector, threshold=threshold, top_k=top_k)
         candidates = []
-        for section_id, emb in self.section_embeddings.items():
-            sim = torch.nn.functional.cosine_similarity(
-                query_tensor, torch.tensor(emb), dim=0).item()
-            if sim >= threshold:
-                node = self.section_data[section_id]
-                candidates.append({
-                    "id": section_id,
-                    "title": node["title"],
-                    "score": sim,
-                    "level": self._get_hierarchy_level(section_id)
-                })
-        return sorted(candidates, key=lambda x: (-x["score"], x["level"]))
+        for row, sim in zip(rows, scores):
+            section_id = str(self.section_index.ids[row])
+            candidates.append({
+                "id": section_id,
+                "title": self.section_data[section_id]["title"],
+                "score": float(sim),
+                "level": int(self.section_index.depths[row])
+            })
+        return candidates
 
     def _get_related_sections(self, section_id):
         parent = self.section_data[section_id].get("parent_id")
         children = self.section_hierarchy.get(section_id, [])
         return ([parent] if parent else []) + children
 
-    def _get_hierarchy_level(self, section_id):
-        level = 0
-        current_id = section_id
-        while current_id in self.section_data:
-            parent = self.section_data[current_id].get("parent_id")
-            if not parent:
-                break
-            level += 1
-            current_id = parent
-        return level
+    @staticmethod
+    def _has_vector(result):
+        return bool(result.vector) and "default" in result.vector
+
+    def _score_candidates(self, results, query_vector):
+        """
+        Score the whole candidate block at once. Without vectors the Qdrant cosine
+        score is the final score; with vectors it is blended with a cosine rerank
+        computed in a single NumPy matrix-vector product.
+        """
+        qdrant_scores = np.fromiter((r.score for r in results), dtype=np.float32, count=len(results))
+        if not self.fetch_vectors:
+            return qdrant_scores
+
+        chunk_embs = np.asarray([r.vector["default"] for r in results], dtype=np.float32)
+        query_emb = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(chunk_embs, axis=1) * np.linalg.norm(query_emb)
+        sim_scores = (chunk_embs @ query_emb) / np.maximum(norms, 1e-12)
+        return 0.6 * qdrant_scores + 0.4 * sim_scores
 
     def _rerank_and_filter_chunks(self, results, query_vector):
-        query_emb = torch.tensor(query_vector, dtype=torch.float)
-        query_emb = torch.nn.functional.normalize(query_emb, dim=0)
-
-        chunks = []
-
+        usable = []
         for r in results:
             payload = r.payload
             logger.debug(f"🧪 Payload text preview: {payload.get('text', '')[:80]}")
             text = str(payload.get("text", "")).strip()
-            
-            # Handle named vector response
-            if not text or not r.vector or "default" not in r.vector:
+
+            if not text or (self.fetch_vectors and not self._has_vector(r)):
                 logger.warning(f"⚠️ Skipping result with empty text or missing vector: {payload}")
                 continue
+            usable.append(r)
 
-            # Extract the vector from the named dict
-            vector_values = r.vector["default"]
-            chunk_emb = torch.tensor(vector_values, dtype=torch.float)
-            chunk_emb = torch.nn.functional.normalize(chunk_emb, dim=0)
+        if not usable:
+            logger.error("No usable chunks found — retrieval returned empty or invalid text.")
+            return "No relevant content found.", [], []
 
-            sim_score = torch.nn.functional.cosine_similarity(
-                query_emb, chunk_emb, dim=0).item()
-            
+        chunks = []
+        for r, final_score in zip(usable, self._score_candidates(usable, query_vector).tolist()):
+            payload = r.payload
             citation = f"Page {payload.get('page_start', 'N/A')} | Title: {payload.get('title', 'Unknown Title')}"
-
-            final_score = 0.6 * r.score + 0.4 * sim_score
-            
-
-            logger.debug(f"[{citation}] Qdrant: {r.score:.4f}, Rerank: {sim_score:.4f}, Final: {final_score:.4f}")
+            logger.debug(f"[{citation}] Qdrant: {r.score:.4f}, Final: {final_score:.4f}")
 
             chunks.append({
-                "text": text,
+                "text": str(payload.get("text", "")).strip(),
                 "citation": citation,
                 "score": final_score
             })
-        if not chunks:
-            logger.error("No usable chunks found — retrieval returned empty or invalid text.")
-            return "No relevant content found.", [], []
 
         # Use smart selection logic
         top_chunks = self._select_top_chunks(chunks)
@@ -1,41 +1,117 @@
+import hashlib
 import logging
-from typing import List, Dict
+import os
+import sys
+from typing import List, Dict, Optional, Tuple
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from shared.config import ONNX_DIR, RERANKER_BACKEND, RERANKER_BATCH_SIZE, RERANKER_CACHE_SIZE
+from shared.lru_cache import LRUCache
+
 # === Logger ===
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
 class CrossEncoderReranker:
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", top_k: int = 5):
+    BACKENDS = ("torch", "onnx", "onnx-int8")
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        top_k: int = 5,
+        backend: str = RERANKER_BACKEND,
+        batch_size: int = RERANKER_BATCH_SIZE,
+        cache_size: int = RERANKER_CACHE_SIZE,
+    ):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Invalid reranker backend {backend}. Must be one of {self.BACKENDS}.")
         self.top_k = top_k
         self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        if backend == "torch":
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            self.model.eval()
+        else:
+            self.session = self._load_onnx_session(backend)
+        # Scores keyed by (query hash, ticket key, ticket `updated`), so an edited ticket is rescored
+        self.score_cache = LRUCache(maxsize=cache_size)
+
+    def _load_onnx_session(self, backend: str):
+        from shared.onnx_backend import OnnxSession, export_onnx, quantize_int8
+
+        model_dir = os.path.join(ONNX_DIR, self.model_name.replace("/", "__"))
+        fp32_path = os.path.join(model_dir, "model.onnx")
+        path = os.path.join(model_dir, "model.int8.onnx") if backend == "onnx-int8" else fp32_path
+
+        if not os.path.exists(fp32_path):
+            logger.info(f"Exporting {self.model_name} to ONNX at {fp32_path}")
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            export_onnx(model, self.tokenizer, fp32_path, output_axes={0: "batch"})
+        if not os.path.exists(path):
+            logger.info(f"Quantizing {fp32_path} to int8")
+            quantize_int8(fp32_path, path)
+        return OnnxSession(path)
+
+    @staticmethod
+    def _cache_key(query_hash: str, doc: Dict) -> Optional[Tuple[str, str, str]]:
+        metadata = doc.get("metadata") or {}
+        key = metadata.get("key")
+        if not key:
+            return None
+        return query_hash, key, str(metadata.get("updated", ""))
 
     def rerank(self, query: str, docs: List[Dict]) -> List[Dict]:
         logger.info(f" Reranking top {len(docs)} results using {self.model_name}")
-        inputs = self.tokenizer(
-            [query] * len(docs),
-            [doc["text"] for doc in docs],
-            padding=True,
-            truncation=True,
-            return_tensors="pt"
-        )
-
-        with torch.no_grad():
-            scores = self.model(**inputs).logits.squeeze().tolist()
+        query_hash = hashlib.sha256(query.strip().encode("utf-8")).hexdigest()
+        cache_keys = [self._cache_key(query_hash, doc) for doc in docs]
+        scores = [self.score_cache.get(key) if key else None for key in cache_keys]
 
-        if isinstance(scores, float): 
-            scores = [scores]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            fresh = self._score_pairs(query, [docs[i]["text"] for i in missing])
+            for i, score in zip(missing, fresh):
+                scores[i] = score
+                if cache_keys[i]:
+                    self.score_cache.put(cache_keys[i], score)
+        logger.info(f" Scored {len(missing)} pairs, {len(docs) - len(missing)} served from cache")
 
         # Add scores and sort
-        for i, doc in enumerate(docs):
-            doc["rerank_score"] = scores[i]
+        for doc, score in zip(docs, scores):
+            doc["rerank_score"] = score
 
         sorted_docs = sorted(docs, key=lambda d: d["rerank_score"], reverse=True)
         logger.info("Reranking complete")
 
         return sorted_docs[:self.top_k]
+
+    def _score_pairs(self, query: str, texts: List[str]) -> List[float]:
+        """
+        Score (query, text) pairs in batches of similar token length, so a long
+        ticket only pads the batch it lands in instead of every pair.
+        """
+        encoded = self.tokenizer([query] * len(texts), texts, truncation=True)
+        order = sorted(range(len(texts)), key=lambda i: len(encoded["input_ids"][i]))
+        scores = [0.0] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            features = {name: [values[i] for i in rows] for name, values in encoded.items()}
+            if self.backend == "torch":
+                inputs = self.tokenizer.pad(features, return_tensors="pt")
+                with torch.no_grad():
+                    logits = self.model(**inputs).logits
+                batch_scores = logits[:, 0].tolist()
+            else:
+                inputs = self.tokenizer.pad(features, return_tensors="np")
+                batch_scores = self.session(inputs)[:, 0].tolist()
+            for row, score in zip(rows, batch_scores):
+                scores[row] = float(score)
+        return scores
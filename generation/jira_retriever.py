@@ -1,10 +1,12 @@
 # generation/jira_hybrid_retriever.py
 from qdrant_client.models import SparseVector, Prefetch, FusionQuery, Fusion
 import logging
-from qdrant_client import QdrantClient, models
+from qdrant_client import models
 from qdrant_client.models import SparseVector
+import asyncio
 import os
 import sys 
+import time
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, ".."))
@@ -12,10 +14,13 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 
-from Indexing.Jira_indexing.indexing.utils import get_dense_embedding, generate_sparse_vector
+from Indexing.Jira_indexing.indexing.utils import get_dense_embedding, generate_sparse_query_vector
 from query_expander import QueryExpander
 from typing import Optional, List, Dict
 from jira_reranker import CrossEncoderReranker
+from generation.components import get_async_qdrant_client
+from generation.async_runtime import run_sync
+from shared.config import HYDE_DEADLINE, HYDE_MAX_CONCURRENT
 logging.basicConfig(
     filename="jira_retriever.log",
     filemode="a",
@@ -26,41 +31,105 @@ logger = logging.getLogger(__name__)
 
 
 class JiraHybridRetriever:
+    # Candidates fetched per leg before RRF fusion, as multiples of top_k. The
+    # BM25 sparse leg now carries real lexical recall, so the dense leg can be shallower.
+    DENSE_PREFETCH_FACTOR = 2
+    SPARSE_PREFETCH_FACTOR = 3
+
     def __init__(
         self,
         collection_name="jira_tickets_hybrid",
         host="localhost",
         port=6333,
-        model_name="deepseek-r1:1.5b"
+        model_name="deepseek-r1:1.5b",
+        query_expander: Optional[QueryExpander] = None,
+        reranker: Optional[CrossEncoderReranker] = None,
+        hyde_deadline: float = HYDE_DEADLINE,
+        hyde_max_concurrent: int = HYDE_MAX_CONCURRENT
     ):
-        self.client = QdrantClient(host=host, port=port)
+        # Only the address is kept; see get_async_qdrant_client
+        self.host = host
+        self.port = port
         self.collection_name = collection_name
-        self.query_expander = QueryExpander(model_name=model_name)
-        self.reranker = CrossEncoderReranker(top_k=5)
+        self.query_expander = query_expander or QueryExpander(model_name=model_name)
+        self.reranker = reranker or CrossEncoderReranker(top_k=5)
+        self.hyde_deadline = hyde_deadline
+        # HyDE generations run as tasks while the plain-query search is in flight; one
+        # that misses the deadline keeps running and fills the expander's cache
+        self.hyde_max_concurrent = hyde_max_concurrent
+        self._hyde_tasks = set()
 
     def retrieve(self, question: str, top_k: int = 5, filters: Optional[models.Filter] = None):
+        """Blocking `aretrieve`, run on the shared background event loop."""
+        return run_sync(self.aretrieve(question, top_k=top_k, filters=filters))
+
+    async def aretrieve(self, question: str, top_k: int = 5, filters: Optional[models.Filter] = None):
+        """
+        Hybrid search over Jira tickets. HyDE and the hybrid query are awaited,
+        and the cross-encoder pass runs in a worker thread.
+        """
         logger.info(f" Query received: {question}")
-        # Generate dense and sparse vectors
-        dense_vector = self.query_expander.expand_query_hyde(question)
-        logger.info(f"Query expanded via Hyde") 
-        sparse_vector = generate_sparse_vector(question)
-
+        sparse_vector = generate_sparse_query_vector(question)
+        client = get_async_qdrant_client(self.host, self.port)
+
+        dense_vector = self.query_expander.cached_hyde(question)
+        if dense_vector is not None:
+            logger.info("HyDE vector served from cache")
+            results = await client.query_points(**self._hybrid_query(dense_vector, sparse_vector, top_k, filters))
+            return await asyncio.to_thread(self._rerank_and_format, question, results.points)
+
+        deadline = time.monotonic() + self.hyde_deadline
+        hyde_task = self._start_hyde(question)
+        plain_vector = await asyncio.to_thread(get_dense_embedding, question)
+        results = await client.query_points(**self._hybrid_query(plain_vector, sparse_vector, top_k, filters))
+        if hyde_task is None:
+            return await asyncio.to_thread(self._rerank_and_format, question, results.points)
+
+        done, _ = await asyncio.wait({hyde_task}, timeout=max(deadline - time.monotonic(), 0))
+        dense_vector = None
+        if done:
+            try:
+                dense_vector = hyde_task.result()
+            except Exception as e:
+                logger.warning(f"HyDE not used: {e!r}")
+        if dense_vector is not None:
+            logger.info("Query expanded via Hyde")
+            results = await client.query_points(**self._hybrid_query(dense_vector, sparse_vector, top_k, filters))
+        else:
+            logger.info("HyDE missed the deadline, using the plain-query search")
+        return await asyncio.to_thread(self._rerank_and_format, question, results.points)
+
+    def _start_hyde(self, question: str) -> Optional[asyncio.Task]:
+        """
+        Start a HyDE generation, or return None when `hyde_max_concurrent` are
+        already running. Generations that missed their deadline keep running until
+        HYDE_GENERATION_TIMEOUT, so queueing behind them would only miss too.
+        """
+        if len(self._hyde_tasks) >= self.hyde_max_concurrent:
+            logger.warning(f"HyDE skipped: {len(self._hyde_tasks)} earlier generations still running")
+            return None
+        task = asyncio.create_task(self.query_expander.agenerate_hyde(question))
+        # Keep a reference so a task that outlives this request is not garbage collected
+        self._hyde_tasks.add(task)
+        task.add_done_callback(self._hyde_tasks.discard)
+        return task
+
+    def _hybrid_query(self, dense_vector, sparse_vector, top_k, filters):
+        """Arguments of the RRF-fused dense + sparse `query_points` call."""
         #Prepare prefetch for dense and sparse
         prefetch = [
             Prefetch(
                 query=dense_vector,
                 using="dense",  
-                limit=top_k * 3
+                limit=top_k * self.DENSE_PREFETCH_FACTOR
             ),
             Prefetch(
                 query=SparseVector(**sparse_vector),
                 using="sparse",  
-                limit=top_k * 3
+                limit=top_k * self.SPARSE_PREFETCH_FACTOR
             )
         ]
-
-        #Perform hybrid query using Fusion (RRF)
-        results = self.client.query_points(
+        return dict(
             collection_name=self.collection_name,
             prefetch=prefetch,
             query=FusionQuery(fusion=Fusion.RRF),
@@ -69,14 +138,15 @@ class JiraHybridRetriever:
             query_filter=filters
         )
 
-        logger.info(f"Qdrant returned {len(results.points)} results")
-        if not results.points:
+    def _rerank_and_format(self, question: str, points):
+        logger.info(f"Qdrant returned {len(points)} results")
+        if not points:
             logger.warning("No results from Qdrant hybrid search")
             return "No results found.", [], []
 
         #prepare docs for reranking 
         docs = []
-        for hit in results.points:
+        for hit in points:
             payload = hit.payload
             key = payload.get("key", "N/A")
             title = payload.get("title", "")
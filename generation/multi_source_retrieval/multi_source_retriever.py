@@ -1,14 +1,19 @@
 # multi_source_retriever.py
-from typing import List, Tuple
+import asyncio
+from typing import Dict, List, Optional, Tuple
 import sys 
 import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
-from jira_retriever import JiraHybridRetriever
-from doc_retriever import SoftHybridRetriever
+project_root = os.path.abspath(os.path.join(parent_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 from .routing_controller import RoutingController
+from generation.query_embedding_utils import get_embedding
+from shared.config import DEFAULT_SOURCE_TIMEOUT, SOURCE_TIMEOUTS
+from generation.async_runtime import run_sync
 import logging
 
 # LOGGING SETUP 
@@ -22,31 +27,86 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class MultiSourceRetriever:
-    def __init__(self, model_name: str = "deepseek-r1:1.5b"):
-        self.routing = RoutingController()
-        self.retrievers = {
-            "cap_manual_v3": SoftHybridRetriever(collection_name="cap_manual_v3", host="localhost", port=6333),
-            "jira_tickets_hybrid": JiraHybridRetriever(collection_name="jira_tickets_hybrid", host="localhost", port=6333, model_name=model_name),
-        }
+    def __init__(
+        self,
+        model_name: str = "deepseek-r1:1.5b",
+        retrievers: Optional[Dict] = None,
+        routing: Optional[RoutingController] = None,
+        source_timeouts: Optional[Dict[str, float]] = None,
+    ):
+        if retrievers is None or routing is None:
+            # Fall back to the process-wide instances instead of building private copies
+            from generation.components import get_manual_retriever, get_jira_retriever, get_routing_controller
+            retrievers = retrievers or {
+                "cap_manual_v3": get_manual_retriever(),
+                "jira_tickets_hybrid": get_jira_retriever(model_name=model_name),
+            }
+            routing = routing or get_routing_controller()
+        self.routing = routing
+        self.retrievers = retrievers
+        self.source_timeouts = {**SOURCE_TIMEOUTS, **(source_timeouts or {})}
         logger.info("MultiSourceRetriever initialized with retrievers: %s", list(self.retrievers.keys()))
-    def retrieve(self, query: str, top_k: int = 5) -> Tuple[str, List[str], List[str]]:
+
+    # Sources whose retriever can reuse a precomputed query embedding
+    QUERY_VECTOR_SOURCES = {"cap_manual_v3"}
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        sources: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None,
+    ) -> Tuple[str, List[str], List[str]]:
+        """Blocking `aretrieve`, run on the shared background event loop."""
+        return run_sync(self.aretrieve(query, top_k=top_k, sources=sources, query_vector=query_vector))
+
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        sources: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None,
+    ) -> Tuple[str, List[str], List[str]]:
+        """
+        Route the query and fan out to every routed source at once: their
+        `aretrieve` coroutines run concurrently, each under its own `wait_for`
+        deadline, and late or failing sources are dropped.
+        """
         logger.info("Received query: %s", query)
-        sources = self.routing.route(query)
+        if sources is None:
+            # One query embedding serves both the router's centroid tier and the manual search
+            if query_vector is None:
+                query_vector = await asyncio.to_thread(get_embedding, query)
+            sources = await asyncio.to_thread(self.routing.route, query, query_vector)
         logger.info("Routing determined the sources: %s", sources)
         all_chunks, all_citations, all_texts = [], [], []
 
+        routed, calls = [], []
         for source in sources:
             retriever = self.retrievers.get(source)
             if retriever:
                 logger.info("Using retriever for source: %s", source)
-                context, citations, texts = retriever.retrieve(query, top_k=top_k)
-                logger.info("Retrieved %d chunks from %s", len(texts), source)
-                all_chunks.extend(context.split("\n\n"))
-                all_citations.extend(citations)
-                all_texts.extend(texts)
+                kwargs = {"query_vector": query_vector} if source in self.QUERY_VECTOR_SOURCES else {}
+                timeout = self.source_timeouts.get(source, DEFAULT_SOURCE_TIMEOUT)
+                routed.append(source)
+                calls.append(asyncio.wait_for(retriever.aretrieve(query, top_k=top_k, **kwargs), timeout))
             else:
                 logger.warning("No retriever found for source: %s", source)
-        # Combine and return
+
+        # gather keeps the routing order, so the merged context does not depend on which source finished first
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        for source, result in zip(routed, results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning("Dropping source %s: no result within %.1fs", source, self.source_timeouts.get(source, DEFAULT_SOURCE_TIMEOUT))
+                continue
+            if isinstance(result, BaseException):
+                logger.error("Dropping source %s: retriever failed with %r", source, result)
+                continue
+            context, citations, texts = result
+            logger.info("Retrieved %d chunks from %s", len(texts), source)
+            all_chunks.extend(context.split("\n\n"))
+            all_citations.extend(citations)
+            all_texts.extend(texts)
         context = "\n\n".join(all_chunks)
         logger.info("Final combined context has %d paragraphs", len(all_chunks))
         return context, all_citations, all_texts
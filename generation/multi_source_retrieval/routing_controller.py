@@ -1,13 +1,35 @@
-from typing import List
+import logging
+import re
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
 from transformers import pipeline
 
+from generation.query_embedding_utils import embed, embed_batch
+
+logger = logging.getLogger(__name__)
+
+
 class RoutingController:
     """
-    Routes queries to the appropriate source(s) using both keyword heuristics
-    and a semantic zero-shot classifier for more robust intent detection.
+    Routes queries to the appropriate source(s) in three tiers, cheapest first:
+
+    1. keyword: exactly one of the manual/jira keyword lists matches, counting
+       only keywords strong enough to decide on their own (see `weak_keywords`).
+    2. centroid: cosine similarity of the query embedding to a manual and a jira
+       prototype centroid, decided when one wins by at least `centroid_margin`.
+    3. zero_shot: the BART-large-MNLI zero-shot classifier, only loaded and run
+       when neither cheaper tier is confident.
+
+    The tier that decided is returned by `route_with_tier` and counted in
+    `tier_counts`, so the share of queries that still reach BART can be measured.
     """
-    def __init__(self):
-        # Keyword-based fallback for safety 
+    TIERS = ("keyword", "centroid", "zero_shot")
+
+    def __init__(self, centroid_margin: float = 0.05):
+        # Keyword-based fallback for safety
         self.manual_keywords = [
             "how to", "steps", "procedure", "workflow", "guide", "instruction", "document",
             "navigate", "manual", "usage", "configuration"
@@ -16,24 +38,105 @@ class RoutingController:
             "error", "issue", "build fails", "ticket", "jira", "deployment", "log", "solution",
             "failed", "bug", "problem", "not working", "fix"
         ]
-        self.classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli"
-        )
+        # Too ambiguous to route a query alone ("log in", "fix a setting"); they only
+        # add a source in the zero-shot tier, as the keyword fallback always did
+        self.weak_keywords = {"log", "fix", "issue", "problem", "solution", "document", "usage"}
+        self._manual_strong = self._keyword_pattern(kw for kw in self.manual_keywords if kw not in self.weak_keywords)
+        self._jira_strong = self._keyword_pattern(kw for kw in self.jira_keywords if kw not in self.weak_keywords)
+        self._manual_any = self._keyword_pattern(self.manual_keywords)
+        self._jira_any = self._keyword_pattern(self.jira_keywords)
+        # Example queries whose mean embedding represents each source
+        self.manual_prototypes = [
+            "How do I use this feature of the CPI Automation Portal?",
+            "Where can I find this setting in the portal user interface?",
+            "What are the steps to configure a new workflow?",
+            "Explain how to navigate to the project overview page.",
+            "What does this option do according to the user guide?",
+        ]
+        self.jira_prototypes = [
+            "The pipeline fails with an error after the last deployment.",
+            "Has anyone reported this bug before and how was it fixed?",
+            "The job is stuck and the logs show an exception.",
+            "Something stopped working after the upgrade, is there a known issue?",
+            "What was the solution for the failing build in the previous ticket?",
+        ]
         self.labels = ["manual", "jira"]
         self.threshold = 0.5
+        self.centroid_margin = centroid_margin
+        self.tier_counts = Counter()
+
+        self._lock = threading.Lock()
+        self._classifier = None
+        self._centroids = None
+
+    @staticmethod
+    def _keyword_pattern(keywords) -> "re.Pattern":
+        # Whole words only, so "log" does not match "catalog" and "fix" not "prefix"
+        return re.compile(r"\b(?:" + "|".join(re.escape(kw) for kw in keywords) + r")\b")
+
+    @property
+    def classifier(self):
+        if self._classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    self._classifier = pipeline(
+                        "zero-shot-classification",
+                        model="facebook/bart-large-mnli"
+                    )
+        return self._classifier
 
-    def route(self, query: str) -> List[str]:
+    @property
+    def centroids(self) -> np.ndarray:
+        """Normalized (2, dim) matrix of the manual and jira prototype centroids."""
+        if self._centroids is None:
+            centroids = np.stack([
+                embed_batch(self.manual_prototypes).mean(axis=0),
+                embed_batch(self.jira_prototypes).mean(axis=0),
+            ])
+            self._centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+        return self._centroids
+
+    def warm_up(self):
+        """Load the centroids and the zero-shot classifier ahead of the first uncertain query."""
+        _ = self.centroids
+        _ = self.classifier
+
+    def route(self, query: str, query_vector: Optional[List[float]] = None) -> List[str]:
+        routes, _ = self.route_with_tier(query, query_vector)
+        return routes
+
+    def route_with_tier(self, query: str, query_vector: Optional[List[float]] = None) -> Tuple[List[str], str]:
+        """
+        Return the routed sources and the tier that decided them. `query_vector`
+        lets callers pass the query embedding they already computed for retrieval.
+        """
         q = query.strip()
+        lower_q = q.lower()
+        kw_manual = bool(self._manual_strong.search(lower_q))
+        kw_jira = bool(self._jira_strong.search(lower_q))
+
+        # Tier 1: an unambiguous keyword decision
+        if kw_manual != kw_jira:
+            routes = ["cap_manual_v3"] if kw_manual else ["jira_tickets_hybrid"]
+            return self._decided(routes, "keyword")
+
+        # Tier 2: nearest prototype centroid, if it wins clearly
+        vector = np.asarray(query_vector if query_vector is not None else embed(q), dtype=np.float32)
+        manual_sim, jira_sim = self.centroids @ (vector / max(np.linalg.norm(vector), 1e-12))
+        if abs(manual_sim - jira_sim) >= self.centroid_margin:
+            routes = ["cap_manual_v3"] if manual_sim > jira_sim else ["jira_tickets_hybrid"]
+            return self._decided(routes, "centroid")
+
+        # Tier 3: zero-shot classification
         result = self.classifier(q, self.labels)
         scores = {label: score for label, score in zip(result['labels'], result['scores'])}
         semantic_manual = scores.get('manual', 0) >= self.threshold
         semantic_jira = scores.get('jira', 0) >= self.threshold
-        lower_q = q.lower()
-        kw_manual = any(kw in lower_q for kw in self.manual_keywords)
-        kw_jira = any(kw in lower_q for kw in self.jira_keywords)
-        use_manual = semantic_manual or (kw_manual and not kw_jira)
-        use_jira = semantic_jira or (kw_jira and not kw_manual)
+        # Keyword hints, weak ones included, can still add a source the classifier missed
+        hint_manual = bool(self._manual_any.search(lower_q))
+        hint_jira = bool(self._jira_any.search(lower_q))
+        use_manual = semantic_manual or (hint_manual and not hint_jira)
+        use_jira = semantic_jira or (hint_jira and not hint_manual)
 
         routes = []
         if use_manual:
@@ -44,4 +147,9 @@ class RoutingController:
         if not routes:
             routes = ["cap_manual_v3", "jira_tickets_hybrid"]
 
-        return routes
+        return self._decided(routes, "zero_shot")
+
+    def _decided(self, routes: List[str], tier: str) -> Tuple[List[str], str]:
+        self.tier_counts[tier] += 1
+        logger.info(f"Routed by {tier} tier to {routes} | tier counts: {dict(self.tier_counts)}")
+        return routes, tier
@@ -1,36 +1,104 @@
 # generation/query_expander.py
 
+import asyncio
 import random
-from query_ollama_llm import query_ollama
+from query_ollama_llm import query_ollama, aquery_ollama
 from generation.query_embedding_utils import get_embedding
+from generation.think_filter import strip_think
+from shared.config import (
+    HYDE_CACHE_SIZE,
+    HYDE_CACHE_TTL,
+    HYDE_GENERATION_TIMEOUT,
+    HYDE_NUM_PREDICT,
+    HYDE_STOP,
+)
+from shared.lru_cache import LRUCache
 
 class QueryExpander:
-    def __init__(self, model_name="deepseek-r1:1.5b"):
+    def __init__(self, model_name="deepseek-r1:1.5b", cache_size=HYDE_CACHE_SIZE, cache_ttl=HYDE_CACHE_TTL):
         self.model_name = model_name
+        # HyDE vectors keyed by (model, normalized question); only successful generations are stored
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
 
-    def expand_query_hyde(self, question):
-        """
-        Use HyDE (Hypothetical Document Embeddings) to generate an imaginary answer
-        and re-embed it as an enriched query.
-        """
-        hyde_prompt = f"""You are a technical writer. Imagine you are writing a short, factual answer to the following question, based on a previous Jira ticket.
+    @staticmethod
+    def normalize(question):
+        return " ".join(question.lower().split())
+
+    def _cache_key(self, question):
+        return self.model_name, self.normalize(question)
+
+    def cached_hyde(self, question):
+        """Return the cached HyDE vector for `question`, or None."""
+        return self.cache.get(self._cache_key(question))
+
+    def _hyde_prompt(self, question):
+        return f"""You are a technical writer. Imagine you are writing a short, factual answer to the following question, based on a previous Jira ticket.
 
         Question: {question}
 
         Write a concise answer (~5 lines max) as if the ticket existed before"""
 
-        generated_answer = query_ollama(hyde_prompt, model=self.model_name)
+    def _hyde_request(self, question):
+        """Prompt and bounded, reasoning-free generation arguments for the HyDE call."""
+        return dict(
+            prompt=self._hyde_prompt(question),
+            model=self.model_name,
+            timeout=HYDE_GENERATION_TIMEOUT,
+            options={"num_predict": HYDE_NUM_PREDICT, "stop": HYDE_STOP},
+            think=False,
+        )
 
+    def generate_hyde(self, question):
+        """
+        Generate and embed a hypothetical answer, bounded by HYDE_GENERATION_TIMEOUT.
+        Returns None when Ollama fails or times out, so callers can fall back.
+        """
+        cached = self.cached_hyde(question)
+        if cached is not None:
+            return cached
+        # Only the hypothetical answer is embedded, never the model's reasoning
+        generated_answer = strip_think(query_ollama(**self._hyde_request(question)))
         if not generated_answer:
+            return None
+        vector = get_embedding(generated_answer)
+        self.cache.put(self._cache_key(question), vector)
+        return vector
+
+    async def agenerate_hyde(self, question):
+        """Async `generate_hyde`; the embedding runs in a worker thread."""
+        cached = self.cached_hyde(question)
+        if cached is not None:
+            return cached
+        generated_answer = strip_think(await aquery_ollama(**self._hyde_request(question)))
+        if not generated_answer:
+            return None
+        vector = await asyncio.to_thread(get_embedding, generated_answer)
+        self.cache.put(self._cache_key(question), vector)
+        return vector
+
+    def expand_query_hyde(self, question):
+        """
+        Use HyDE (Hypothetical Document Embeddings) to generate an imaginary answer
+        and re-embed it as an enriched query.
+        """
+        vector = self.generate_hyde(question)
+        if vector is None:
             return get_embedding(question)
+        return vector
 
-        # Embed the generated answer
-        return get_embedding(generated_answer)
+    async def aexpand_query_hyde(self, question):
+        """
+        Async HyDE: the Ollama call is awaited and the embedding runs in a worker
+        thread, so the event loop stays free for other requests.
+        """
+        vector = await self.agenerate_hyde(question)
+        if vector is None:
+            return await asyncio.to_thread(get_embedding, question)
+        return vector
 
 
     def expand_query_variants(self, question):
         """
         Optionally, generate paraphrases if multiple expansions (to be done if we have time).
         """
-        return [question]  
-
+        return [question]
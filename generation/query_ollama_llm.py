@@ -1,31 +1,265 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from shared.config import (
+    OLLAMA_BASE_URL,
+    LLM_CONNECT_TIMEOUT,
+    LLM_READ_TIMEOUT,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_MAX_RETRIES,
+    OLLAMA_RETRY_BACKOFF,
+    OLLAMA_KEEP_ALIVE,
+)
+from generation.async_runtime import loop_local
+from generation.think_filter import THINK_OPEN, THINK_CLOSE
+
+logger = logging.getLogger(__name__)
+
+# Worth retrying: Ollama is busy or restarting. Anything else is returned to the caller.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class _EventText:
+    """
+    Turn Ollama's NDJSON stream events into text chunks. When the server splits
+    reasoning into a `thinking` field, it is re-wrapped in <think> tags so callers
+    see the same shape as a model that emits the tags inline.
+    """
+
+    def __init__(self):
+        self.thinking = False
+
+    def __call__(self, event):
+        if event.get("error"):
+            raise RuntimeError(f"Ollama error: {event['error']}")
+        pieces = []
+        if event.get("thinking"):
+            if not self.thinking:
+                self.thinking = True
+                pieces.append(THINK_OPEN)
+            pieces.append(event["thinking"])
+        if event.get("response"):
+            if self.thinking:
+                self.thinking = False
+                pieces.append(THINK_CLOSE)
+            pieces.append(event["response"])
+        if event.get("done") and self.thinking:
+            self.thinking = False
+            pieces.append(THINK_CLOSE)
+        return pieces
+
+
+class OllamaClient:
+    """
+    Client for Ollama's /api/generate endpoint.
+
+    Sync calls share one requests.Session with a pooled adapter; async calls share
+    one httpx.AsyncClient per event loop. Connection errors and 429/5xx responses
+    are retried with exponential backoff; read timeouts are not, because a timed
+    out generation would only time out again. Every request sends `keep_alive`
+    so the model stays loaded between questions.
+    """
+
+    def __init__(
+        self,
+        base_url=OLLAMA_BASE_URL,
+        connect_timeout=LLM_CONNECT_TIMEOUT,
+        read_timeout=LLM_READ_TIMEOUT,
+        max_retries=OLLAMA_MAX_RETRIES,
+        backoff=OLLAMA_RETRY_BACKOFF,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        pool_size=OLLAMA_POOL_SIZE,
+    ):
+        self.url = base_url.rstrip("/") + "/api/generate"
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _payload(self, prompt, model, stream, options, think):
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+        }
+        if options:
+            payload["options"] = options
+        if think is not None:
+            payload["think"] = think
+        return payload
+
+    def _retry_delay(self, attempt, error):
+        delay = self.backoff * 2 ** attempt
+        logger.warning(f"Ollama request failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
 
-def query_ollama(prompt, model="deepseek-r1:1.5b", stream=False):
+    # Sync API
+
+    def _post(self, payload, stream, timeout):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    self.url,
+                    json=payload,
+                    stream=stream,
+                    timeout=(self.connect_timeout, timeout or self.read_timeout),
+                )
+            except requests.ConnectionError as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                error = requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+                response.close()
+            if attempt < self.max_retries:
+                time.sleep(self._retry_delay(attempt, error))
+        raise error
+
+    def generate(self, prompt, model="deepseek-r1:1.5b", options=None, think=None, timeout=None):
+        """Return the complete response text, or None if the request fails."""
+        try:
+            response = self._post(self._payload(prompt, model, False, options, think), False, timeout)
+            return response.json().get("response")
+        except Exception as e:
+            logger.error(f"Ollama call failed: {e}")
+            return None
+
+    def stream(self, prompt, model="deepseek-r1:1.5b", options=None, think=None, timeout=None):
+        """
+        Yield text chunks as Ollama emits them. `timeout` bounds the wait for each
+        chunk, not the whole generation. Errors are raised to the caller.
+        """
+        response = self._post(self._payload(prompt, model, True, options, think), True, timeout)
+        to_text = _EventText()
+        with response:
+            for line in response.iter_lines():
+                if line:
+                    yield from to_text(json.loads(line))
+
+    # Async API
+
+    def _async_http_client(self):
+        return loop_local(
+            ("ollama_http", self.url, self.pool_size),
+            lambda: httpx.AsyncClient(limits=httpx.Limits(max_connections=self.pool_size)),
+        )
+
+    async def _asend(self, payload, stream, timeout):
+        client = self._async_http_client()
+        for attempt in range(self.max_retries + 1):
+            request = client.build_request(
+                "POST",
+                self.url,
+                json=payload,
+                timeout=httpx.Timeout(timeout or self.read_timeout, connect=self.connect_timeout),
+            )
+            try:
+                response = await client.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Same policy as the sync path, where ConnectTimeout is a requests.ConnectionError
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    if response.is_error:
+                        await response.aread()
+                        await response.aclose()
+                    response.raise_for_status()
+                    return response
+                error = httpx.HTTPStatusError(f"{response.status_code} from Ollama", request=request, response=response)
+                await response.aclose()
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._retry_delay(attempt, error))
+        raise error
+
+    async def agenerate(self, prompt, model="deepseek-r1:1.5b", options=None, think=None, timeout=None):
+        """Async `generate`: return the complete response text, or None if the request fails."""
+        try:
+            response = await self._asend(self._payload(prompt, model, False, options, think), False, timeout)
+            return response.json().get("response")
+        except Exception as e:
+            logger.error(f"Ollama call failed: {e}")
+            return None
+
+    async def astream(self, prompt, model="deepseek-r1:1.5b", options=None, think=None, timeout=None):
+        """Async `stream`: yield text chunks as Ollama emits them."""
+        response = await self._asend(self._payload(prompt, model, True, options, think), True, timeout)
+        to_text = _EventText()
+        try:
+            async for line in response.aiter_lines():
+                if line:
+                    for piece in to_text(json.loads(line)):
+                        yield piece
+        finally:
+            await response.aclose()
+
+
+_client_lock = threading.Lock()
+_default_client = None
+
+
+def get_ollama_client():
+    """Process-wide OllamaClient built from shared.config."""
+    global _default_client
+    with _client_lock:
+        if _default_client is None:
+            _default_client = OllamaClient()
+        return _default_client
+
+
+def query_ollama(prompt, model="deepseek-r1:1.5b", stream=False, timeout=None, options=None, think=None):
     """
     Send a prompt to the local Ollama server and return the model response.
 
     Args:
         prompt (str): The text prompt to send.
         model (str): The name of the local model served by Ollama.
-        stream (bool): Whether to stream the output (not used here).
+        stream (bool): Stream the generation from Ollama and join the chunks here.
+            Use `get_ollama_client().stream` to consume chunks as they arrive.
+        timeout (float): Read timeout in seconds, LLM_READ_TIMEOUT by default.
+        options (dict): Ollama generation options, e.g. num_predict or stop.
+        think (bool): Ollama's reasoning switch for thinking models; omitted when None.
 
     Returns:
         str or None: The model's response or None if an error occurs.
     """
-    url = "http://localhost:11434/api/generate"
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": stream
-    }
-    response=None
+    client = get_ollama_client()
+    if not stream:
+        return client.generate(prompt, model=model, options=options, think=think, timeout=timeout)
     try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        return response.json().get("response")
+        return "".join(client.stream(prompt, model=model, options=options, think=think, timeout=timeout))
     except Exception as e:
-        print("Ollama call failed:", e)
-        if response is not None:
-            print(response.text)
+        logger.error(f"Ollama call failed: {e}")
         return None
 
+
+async def aquery_ollama(prompt, model="deepseek-r1:1.5b", timeout=None, options=None, think=None):
+    """
+    Async counterpart of `query_ollama`: the request is awaited on a pooled
+    httpx client, so other requests keep running while Ollama generates.
+
+    Returns:
+        str or None: The model's response or None if an error occurs.
+    """
+    return await get_ollama_client().agenerate(prompt, model=model, options=options, think=think, timeout=timeout)
@@ -1,7 +1,15 @@
 import os
-from openai import OpenAI
+import sys
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from shared.config import LLM_READ_TIMEOUT
+from generation.async_runtime import loop_local
+
 # Load variables from .env
 load_dotenv()
 
@@ -11,19 +19,54 @@ if not api_key:
     raise ValueError("OPENAI_API_KEY not set in .env or environment")
 
 # Initialize OpenAI client
-client = OpenAI(api_key=api_key)
+client = OpenAI(api_key=api_key, timeout=LLM_READ_TIMEOUT)
+
+
+def _messages(prompt: str):
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt},
+    ]
+
 
 def query_openai(prompt: str, model: str = "gpt-3.5-turbo") -> str:
     try:
         response = client.chat.completions.create(
             model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt},
-            ],
+            messages=_messages(prompt),
             temperature=0.2,
             max_tokens=1024,
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
         return f"[OpenAI Error] {str(e)}"
+
+
+async def aquery_openai(prompt: str, model: str = "gpt-3.5-turbo") -> str:
+    # The async client wraps an httpx pool bound to the running loop, so keep one per loop
+    async_client = loop_local(("openai",), lambda: AsyncOpenAI(api_key=api_key, timeout=LLM_READ_TIMEOUT))
+    try:
+        response = await async_client.chat.completions.create(
+            model=model,
+            messages=_messages(prompt),
+            temperature=0.2,
+            max_tokens=1024,
+        )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        return f"[OpenAI Error] {str(e)}"
+
+
+async def astream_openai(prompt: str, model: str = "gpt-3.5-turbo"):
+    """Yield answer text chunks as the chat completion streams in. Errors are raised to the caller."""
+    async_client = loop_local(("openai",), lambda: AsyncOpenAI(api_key=api_key, timeout=LLM_READ_TIMEOUT))
+    stream = await async_client.chat.completions.create(
+        model=model,
+        messages=_messages(prompt),
+        temperature=0.2,
+        max_tokens=1024,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
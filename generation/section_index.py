@@ -0,0 +1,117 @@
+# generation/section_index.py
+
+import hashlib
+import logging
+import os
+
+import numpy as np
+
+from generation.query_embedding_utils import embed_batch, model_name
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.path.join(os.path.dirname(__file__), "data", "section_index")
+
+
+def metadata_digest(metadata_path, embedding_model=model_name):
+    """Hash of the metadata file contents and the embedding model that produced the index."""
+    sha = hashlib.sha256()
+    sha.update(embedding_model.encode("utf-8"))
+    with open(metadata_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            sha.update(block)
+    return sha.hexdigest()[:16]
+
+
+class SectionTitleIndex:
+    """
+    Normalized title embeddings of every TOC node, kept as one float32 matrix.
+
+    The matrix is persisted as a memory-mapped .npy file next to an .npz sidecar
+    holding the node ids, their depth in the TOC and the row index of their parent
+    (-1 for top-level nodes). Both files are keyed by a hash of the metadata JSON,
+    so the titles are embedded once per manual version instead of per retriever.
+    """
+
+    def __init__(self, matrix, ids, depths, parents):
+        self.matrix = matrix
+        self.ids = ids
+        self.depths = depths
+        self.parents = parents
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load_or_build(cls, nodes, metadata_path, index_dir=INDEX_DIR):
+        digest = metadata_digest(metadata_path)
+        matrix_path = os.path.join(index_dir, f"titles_{digest}.npy")
+        sidecar_path = os.path.join(index_dir, f"titles_{digest}.npz")
+
+        if os.path.exists(matrix_path) and os.path.exists(sidecar_path):
+            logger.info(f"Loading section title index {digest}")
+            sidecar = np.load(sidecar_path, allow_pickle=False)
+            matrix = np.load(matrix_path, mmap_mode="r")
+            return cls(matrix, sidecar["ids"], sidecar["depths"], sidecar["parents"])
+
+        logger.info(f"Building section title index {digest} for {len(nodes)} sections")
+        index = cls.build(nodes)
+        index.save(matrix_path, sidecar_path)
+        return cls(np.load(matrix_path, mmap_mode="r"), index.ids, index.depths, index.parents)
+
+    @classmethod
+    def build(cls, nodes):
+        ids = [str(node["id"]) for node in nodes]
+        row_of = {section_id: row for row, section_id in enumerate(ids)}
+        parents = np.array(
+            [row_of.get(str(node.get("parent_id")), -1) if node.get("parent_id") else -1 for node in nodes],
+            dtype=np.int32,
+        )
+
+        depths = np.zeros(len(ids), dtype=np.int16)
+        for row in range(len(ids)):
+            depth, current, seen = 0, parents[row], {row}
+            while current >= 0 and current not in seen:
+                seen.add(current)
+                depth += 1
+                current = parents[current]
+            depths[row] = depth
+
+        matrix = embed_batch([node["title"] for node in nodes])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+
+        return cls(np.ascontiguousarray(matrix), np.array(ids, dtype=str), depths, parents)
+
+    def save(self, matrix_path, sidecar_path):
+        os.makedirs(os.path.dirname(matrix_path), exist_ok=True)
+        # Write to temporary files first so a concurrent reader never sees a partial index
+        tmp_matrix = matrix_path + ".tmp"
+        tmp_sidecar = sidecar_path + ".tmp"
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, self.matrix)
+        with open(tmp_sidecar, "wb") as f:
+            np.savez(f, ids=self.ids, depths=self.depths, parents=self.parents)
+        os.replace(tmp_matrix, matrix_path)
+        os.replace(tmp_sidecar, sidecar_path)
+
+    def search(self, query_vector, threshold=0.5, top_k=10):
+        """
+        Return (rows, scores) of the best matching sections above `threshold`,
+        ordered by descending similarity and then by shallower depth.
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = self.matrix @ (query / norm)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[scores[top] >= threshold]
+        order = np.lexsort((self.depths[top], -scores[top]))
+        rows = top[order]
+        return rows, scores[rows]
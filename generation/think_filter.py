@@ -0,0 +1,66 @@
+# generation/think_filter.py
+"""Helpers for the <think>...</think> reasoning blocks emitted by deepseek-r1."""
+import re
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+_THINK_BLOCK = re.compile(r"<think>.*?(</think>|$)", re.DOTALL)
+
+
+def strip_think(text):
+    """
+    Remove every reasoning block from `text`. An unterminated block (the token
+    budget ran out mid-thought) is dropped up to the end of the text.
+    """
+    if not text:
+        return text
+    return _THINK_BLOCK.sub("", text).strip()
+
+
+def _partial_tag_length(text, tag):
+    """Length of the longest suffix of `text` that is a proper prefix of `tag`."""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkSplitter:
+    """
+    Split a streamed completion into reasoning and answer text as it arrives.
+
+    `feed` returns ("reasoning" | "answer", text) pieces. Text that could be the
+    start of a tag split across two chunks is held back until the next chunk
+    decides it; `flush` releases whatever is left at the end of the stream.
+    """
+
+    def __init__(self):
+        self.in_think = False
+        self.buffer = ""
+
+    @property
+    def kind(self):
+        return "reasoning" if self.in_think else "answer"
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        pieces = []
+        while True:
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            idx = self.buffer.find(tag)
+            if idx == -1:
+                ready = len(self.buffer) - _partial_tag_length(self.buffer, tag)
+                if ready:
+                    pieces.append((self.kind, self.buffer[:ready]))
+                    self.buffer = self.buffer[ready:]
+                return pieces
+            if idx:
+                pieces.append((self.kind, self.buffer[:idx]))
+            self.buffer = self.buffer[idx + len(tag):]
+            self.in_think = not self.in_think
+
+    def flush(self):
+        pieces = [(self.kind, self.buffer)] if self.buffer else []
+        self.buffer = ""
+        return pieces
@@ -0,0 +1,138 @@
+#delta_sync.py
+"""
+Long-running watermark sync of Jira tickets into Qdrant.
+
+Each cycle asks Jira only for tickets with `updated >= watermark - SYNC_OVERLAP`,
+ordered by `updated`, in pages of SYNC_PAGE_SIZE until a short page shows the
+query is drained. After every page the watermark moves to the newest `updated`
+seen and is stored next to the ticket state, so an interrupted sync resumes
+where it stopped. Tickets re-read because of the overlap are skipped by the
+usual state comparison, so a quiet cycle costs one small request.
+
+Pages advance by restarting the query at the newest minute seen so far (JQL
+dates have minute resolution); only a page that lies entirely within one
+minute falls back to `pager/start` offsets. Deleted tickets are not detected
+here; a full build with main.py removes them.
+"""
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlencode
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from parsers import parse_jira_xml
+from indexing.config import COLLECTION_NAME
+from shared.index_version import bump_index_version
+from JiraUpdater.rss_downloader import fetch_jira_rss
+from JiraUpdater.update_runner import open_collection, open_state, apply_tickets
+from indexing.JiraUpdater.updater_config import (
+    SESSION_ID,
+    XML_EXPORT_URL,
+    SYNC_JQL,
+    SYNC_PAGE_SIZE,
+    SYNC_INTERVAL,
+    SYNC_JITTER,
+    SYNC_OVERLAP,
+)
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "watermark"
+JQL_TIME_FORMAT = "%Y/%m/%d %H:%M"
+
+
+def parse_updated(value: Optional[str]) -> Optional[datetime]:
+    """Parse the RFC 822 `updated` string of the XML export, e.g. 'Tue, 4 Mar 2025 09:15:32 +0100'."""
+    try:
+        stamp = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+
+def page_url(lower: Optional[datetime], start: int, page_size: int = SYNC_PAGE_SIZE) -> str:
+    # `lower` keeps the offset of the export's dates, i.e. the Jira display time zone JQL compares in
+    jql = SYNC_JQL
+    if lower is not None:
+        jql += f' AND updated >= "{lower.strftime(JQL_TIME_FORMAT)}"'
+    jql += " ORDER BY updated ASC, key ASC"
+    return f"{XML_EXPORT_URL}?{urlencode({'jqlQuery': jql, 'tempMax': page_size, 'pager/start': start})}"
+
+
+def sync_once(client, state, session=None, page_size: int = SYNC_PAGE_SIZE, overlap: float = SYNC_OVERLAP) -> int:
+    """Drain every ticket updated since the stored watermark; return how many were upserted."""
+    stored = state.get_meta(WATERMARK)
+    watermark = datetime.fromisoformat(stored) if stored else None
+    lower = (watermark - timedelta(seconds=overlap)).replace(second=0, microsecond=0) if watermark else None
+    start = 0
+    upserted = 0
+
+    fd, page_path = tempfile.mkstemp(prefix=".jira_page_", suffix=".xml")
+    os.close(fd)
+    try:
+        while True:
+            fetch_jira_rss(page_url(lower, start, page_size), SESSION_ID, save_path=page_path, session=session, conditional=False)
+            tickets = parse_jira_xml(page_path)
+            logger.info(f"Delta page from {lower} (start {start}): {len(tickets)} tickets.")
+
+            page_upserted = apply_tickets(tickets, client, state)
+            if page_upserted:
+                upserted += page_upserted
+                bump_index_version(COLLECTION_NAME)
+
+            stamps = [stamp for stamp in (parse_updated(ticket["updated"]) for ticket in tickets) if stamp]
+            newest = max(stamps) if stamps else None
+            if newest is not None and (watermark is None or newest > watermark):
+                watermark = newest
+                state.set_meta(WATERMARK, watermark.isoformat())
+
+            if len(tickets) < page_size:
+                return upserted
+
+            newest_minute = newest.replace(second=0, microsecond=0) if newest else None
+            if newest_minute is not None and (lower is None or newest_minute > lower):
+                lower, start = newest_minute, 0
+            else:
+                # The whole page shares one minute: page through it by offset
+                start += page_size
+    finally:
+        os.remove(page_path)
+
+
+def sync_cycle(session=None) -> None:
+    """Run one sync. Any failure, including Qdrant being unreachable, is logged and left to the next cycle."""
+    state = None
+    try:
+        client = open_collection()
+        if client is None:
+            return
+        state = open_state(client)
+        upserted = sync_once(client, state, session=session)
+        logger.info(f"Delta sync upserted {upserted} tickets, watermark {state.get_meta(WATERMARK)}.")
+    except Exception as e:
+        logger.error(f"Delta sync failed: {e!r}")
+    finally:
+        if state is not None:
+            state.close()
+
+
+def run_forever(interval: float = SYNC_INTERVAL, jitter: float = SYNC_JITTER, session=None) -> None:
+    while True:
+        sync_cycle(session=session)
+        delay = max(0.0, interval + random.uniform(-jitter, jitter))
+        logger.info(f"Next delta sync in {delay:.0f}s.")
+        time.sleep(delay)
+
+
+if __name__ == "__main__":
+    run_forever()
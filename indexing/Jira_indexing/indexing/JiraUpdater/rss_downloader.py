@@ -1,24 +1,101 @@
 #rss_downloader.py
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Optional
+
 import requests
-def fetch_jira_rss(xml_url: str, session_id: str, save_path: str = "SearchRequest_v2.xml"):
+
+from indexing.JiraUpdater.updater_config import DOWNLOAD_TIMEOUT, DOWNLOAD_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def _validators_path(save_path: str) -> str:
+    return f"{save_path}.meta.json"
+
+
+def _load_validators(save_path: str) -> dict:
+    # Validators are only meaningful while the file they describe is still on disk
+    if not os.path.exists(save_path):
+        return {}
+    try:
+        with open(_validators_path(save_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_validators(save_path: str, validators: Dict[str, Optional[str]]) -> None:
+    """
+    Remember the validators returned by `fetch_jira_rss` for the next conditional
+    request. Call it only once the export has been applied: a run that fails
+    after downloading must get the same export again instead of a 304.
+    """
+    with open(_validators_path(save_path), "w", encoding="utf-8") as f:
+        json.dump(validators, f)
+
+
+def fetch_jira_rss(
+    xml_url: str,
+    session_id: str,
+    save_path: str = "SearchRequest_v2.xml",
+    session: Optional[requests.Session] = None,
+    timeout=DOWNLOAD_TIMEOUT,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    conditional: bool = True,
+) -> Optional[Dict[str, Optional[str]]]:
     """
     Downloads the latest Jira XML export using a browser session ID.
-    
+
+    The request is conditional on the ETag / Last-Modified of the previous
+    download, asks for a compressed transfer, and streams the body to a
+    temporary file that replaces `save_path` only once it is complete.
+
     Args:
         xml_url (str): The full Jira XML export URL (with JQL query).
         session_id (str): The value of your browser's JSESSIONID cookie.
         save_path (str): Where to save the downloaded XML file.
+        session: Optional requests.Session, e.g. one pointed at a local stand-in.
+        conditional (bool): Send the validators stored by `save_validators`.
+
+    Returns:
+        None if the server answered 304 Not Modified. Otherwise the new export's
+        ETag / Last-Modified validators, for `save_validators` once it is applied.
     """
     headers = {
-        "Cookie": f"JSESSIONID={session_id}"
+        "Cookie": f"JSESSIONID={session_id}",
+        "Accept-Encoding": "gzip, deflate",
     }
+    validators = _load_validators(save_path) if conditional else {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
 
-    print(f"Fetching XML from: {xml_url}")
-    response = requests.get(xml_url, headers=headers)
+    logger.info(f"Fetching XML from: {xml_url}")
+    http = session or requests
+    with http.get(xml_url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            logger.info(f"{save_path} is up to date (HTTP 304).")
+            return None
+        response.raise_for_status()
 
-    if response.status_code == 200:
-        with open(save_path, "w", encoding="utf-8") as f:
-            f.write(response.text)
-        print(f"XML saved to {save_path}")
-    else:
-        print(f"Failed to fetch XML: HTTP {response.status_code}")
+        directory = os.path.dirname(os.path.abspath(save_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".jira_export_", suffix=".xml.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # iter_content undoes the gzip/deflate transfer encoding chunk by chunk
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+            os.replace(tmp_path, save_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    logger.info(f"XML saved to {save_path}")
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
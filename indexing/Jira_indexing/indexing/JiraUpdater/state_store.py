@@ -0,0 +1,96 @@
+#state_store.py
+"""
+Local change-detection state for the Jira updater.
+
+One SQLite row per indexed ticket: key, the Jira `updated` string and a sha256
+of the document text that was embedded. The updater compares each exported
+ticket against this table instead of pulling the whole collection from Qdrant.
+A small `meta` table holds scalar sync state such as the delta-sync watermark.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from shared.config import SQLITE_QUERY_CHUNK
+
+
+def content_hash(document_text: str) -> str:
+    return hashlib.sha256(document_text.encode("utf-8")).hexdigest()
+
+
+class TicketStateStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # The updater looks tickets up on the pipeline's producer thread and records
+        # them on the calling thread, so the connection is shared behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tickets ("
+            " key TEXT PRIMARY KEY,"
+            " updated TEXT,"
+            " content_hash TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Map each known key to its stored (updated, content_hash)."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_QUERY_CHUNK):
+                chunk = keys[start:start + SQLITE_QUERY_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, updated, content_hash FROM tickets WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, updated, digest in rows:
+                    found[key] = (updated, digest)
+        return found
+
+    def put_many(self, rows: Iterable[Tuple[str, Optional[str], Optional[str]]]) -> None:
+        """Insert or replace (key, updated, content_hash) rows in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO tickets (key, updated, content_hash) VALUES (?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """Forget the given tickets, e.g. after their points were deleted from Qdrant."""
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_QUERY_CHUNK):
+                chunk = keys[start:start + SQLITE_QUERY_CHUNK]
+                self._conn.execute(f"DELETE FROM tickets WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+
+    def clear(self) -> None:
+        """Forget every ticket so the next update seeds the table from Qdrant again. Meta values are kept."""
+        with self._lock:
+            self._conn.execute("DELETE FROM tickets")
+
+    def get_meta(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
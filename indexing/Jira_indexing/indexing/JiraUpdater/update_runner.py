@@ -1,20 +1,22 @@
 #update_runner.py
 import os
 import sys
-from datetime import datetime
 from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
+from qdrant_client.models import Modifier
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
     
-from parsers import parse_jira_xml
-from indexing.utils import get_dense_embedding, generate_sparse_vector
-from indexing.config import QDRANT_HOST, QDRANT_PORT, COLLECTION_NAME
-from JiraUpdater.rss_downloader import fetch_jira_rss
-from indexing.JiraUpdater.updater_config import XML_URL, SESSION_ID, XML_FILE 
+from parsers import iter_jira_xml
+from indexing.utils import cache_stats
+from indexing.pipeline import prepare_document, run_pipeline, scroll_indexed
+from indexing.config import QDRANT_HOST, QDRANT_PORT, COLLECTION_NAME, BATCH_SIZE
+from shared.index_version import bump_index_version
+from JiraUpdater.rss_downloader import fetch_jira_rss, save_validators
+from indexing.JiraUpdater.updater_config import XML_URL, SESSION_ID, XML_FILE, STATE_DB
+from indexing.JiraUpdater.state_store import TicketStateStore, content_hash
 import logging
 
 # Setup logging
@@ -28,102 +30,124 @@ logger = logging.getLogger(__name__)
 
 
 
-def prepare_document(ticket: dict) -> str:
-    """Combine key fields for embedding"""
-    text_parts = [
-        f"Title: {ticket['title']}",
-        f"Summary: {ticket['summary']}",
-        f"Description: {ticket['description']}",
-        f"Status: {ticket['status']}",
-        f"Resolution: {ticket['resolution'] or 'Unresolved'}",
-    ]
 
-    if ticket["comments"]:
-        text_parts.append("Comments:")
-        text_parts.extend(
-            f"- {c['author']} on {c['created']}: {c['text']}" for c in ticket["comments"]
-        )
-
-    if ticket.get("last_comment"):
-        text_parts.append(f"Last Comment: {ticket['last_comment']}")
+def is_changed(ticket, document_hash, previous):
+    """
+    A ticket is re-indexed when its `updated` string or its document text differs
+    from the stored state. Rows seeded from points indexed before payloads carried
+    a content hash have none, so only `updated` decides for them.
+    """
+    previous_updated, previous_hash = previous
+    if ticket["updated"] != previous_updated:
+        return True
+    return previous_hash is not None and previous_hash != document_hash
 
-    if ticket.get("solution"):
-        text_parts.append(f"Solution: {ticket['solution']}")
-
-    return "\n".join(text_parts)
+def open_collection():
+    """Connect to Qdrant, or return None if the collection does not use the current sparse encoding."""
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    sparse_config = (client.get_collection(COLLECTION_NAME).config.params.sparse_vectors or {}).get("sparse")
+    if sparse_config is None or sparse_config.modifier != Modifier.IDF:
+        # Collections built before the BM25 encoder use per-document term ids; mixing them is useless
+        logger.error(f"{COLLECTION_NAME} has no IDF sparse vector, rebuild it with Jira_indexing/main.py first.")
+        return None
+    return client
+
+def open_state(client) -> TicketStateStore:
+    state = TicketStateStore(STATE_DB)
+    if len(state) == 0:
+        # First run or a deleted state file: seed it from the collection's payload fields
+        state.put_many(
+            (payload["key"], payload.get("updated"), payload.get("content_hash"))
+            for _, payload in scroll_indexed(client, COLLECTION_NAME)
+            if "key" in payload
+        )
+        logger.info(f"Seeded update state with {len(state)} tickets from Qdrant.")
+    return state
+
+def changed_tickets(tickets, state, counts, chunk_size=BATCH_SIZE):
+    """
+    Yield (ticket, document_text) for the new or changed tickets of a lazy ticket
+    stream, looking up stored state one chunk of keys at a time. `counts` gets
+    the running "seen" and "changed" totals.
+    """
+    def check(chunk):
+        stored = state.get_many(ticket["key"] for ticket in chunk)
+        for ticket in chunk:
+            counts["seen"] += 1
+            document_text = prepare_document(ticket)
+            previous = stored.get(ticket["key"])
+            if previous is not None and not is_changed(ticket, content_hash(document_text), previous):
+                continue
+            counts["changed"] += 1
+            yield ticket, document_text
+
+    chunk = []
+    for ticket in tickets:
+        chunk.append(ticket)
+        if len(chunk) == chunk_size:
+            yield from check(chunk)
+            chunk = []
+    yield from check(chunk)
+
+def apply_tickets(tickets, client, state) -> int:
+    """
+    Embed and upsert the new or changed tickets among `tickets`, which may be a
+    lazy iterator such as iter_jira_xml; return how many were upserted.
+    """
+    counts = {"seen": 0, "changed": 0}
+
+    def record_state(batch):
+        # Only record the new state once Qdrant has accepted the batch
+        state.put_many(
+            (ticket["key"], ticket["updated"], content_hash(document_text))
+            for ticket, document_text in batch
+        )
 
-def parse_date(date_str):
-    try:
-        return datetime.strptime(date_str, "%a, %d %b %Y %H:%M:%S %z").astimezone().replace(tzinfo=None)
-    except Exception:
-        try:
-            return datetime.strptime(date_str, "%Y-%m-%d")
-        except:
-            return datetime(2000, 1, 1)
+    # Parse, compare, embed and upsert in overlapping, bounded batches
+    stats = run_pipeline(
+        changed_tickets(tickets, state, counts),
+        client,
+        COLLECTION_NAME,
+        on_batch_done=record_state,
+    )
+    logger.info(f"{counts['changed']} of {counts['seen']} tickets are new or changed.")
+    if stats["tickets"]:
+        logger.info(f"Embedding cache: {cache_stats()}")
+        logger.info(f"Upserted {stats['tickets']} tickets at {stats['tickets_per_sec']} tickets/s.")
+    return stats["tickets"]
 
 def run():
     # Fetch XML from JIRA
     try:
-        fetch_jira_rss(XML_URL, SESSION_ID, save_path=XML_FILE)
-        logger.info("XML fetched successfully.")
+        validators = fetch_jira_rss(XML_URL, SESSION_ID, save_path=XML_FILE)
     except Exception as e:
         logger.error(f"Failed to fetch XML: {e}")
         return
+    if validators is None:
+        # Same export as the last run: nothing to parse, embed or upsert
+        logger.info("Jira export not modified since the last run, skipping update.")
+        print("No new or updated tickets found.")
+        return
+    logger.info("XML fetched successfully.")
 
-    # Parse XML into ticket dicts
-    tickets = parse_jira_xml(XML_FILE)
-    logger.info(f"Parsed {len(tickets)} tickets from XML.")
-
+    # Ticket dicts are parsed lazily while the pipeline consumes them
+    tickets = iter_jira_xml(XML_FILE)
 
-    # Load existing ticket update times
-    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
-    existing = {
-        pt.payload["key"]: pt
-        for pt in client.scroll(collection_name=COLLECTION_NAME, limit=100_000)[0]
-        if "key" in pt.payload
-    }
-
-    # Compare and prepare updated points
-    points = []
-    for ticket in tickets:
-        existing_point = existing.get(ticket["key"])
-        current_time = parse_date(ticket["updated"])
-        stored_time = parse_date(existing_point.payload.get("updated", "2000-01-01")) if existing_point else None
-
-        if existing_point and current_time <= stored_time:
-            continue  
-
-        document_text = prepare_document(ticket)
-        dense_vector = get_dense_embedding(document_text)
-        sparse_vector = generate_sparse_vector(document_text)
-
-        metadata = {
-            "key": ticket["key"],
-            "title": ticket["title"],
-            "status": ticket["status"],
-            "resolution": ticket["resolution"],
-            "priority": ticket["priority"],
-            "created": ticket["created"],
-            "updated": ticket["updated"],
-            "has_attachments": len(ticket["attachments"]) > 0,
-            "comment_count": len(ticket["comments"]),
-            "labels": ticket["labels"],
-            "description": ticket["description"],
-            "last_comment": ticket.get("last_comment", ""),
-            "solution": ticket.get("solution", ""),
-            "link": f"https://eteamproject.internal.ericsson.com/browse/{ticket['key']}",
-        }
-
-        points.append(PointStruct(
-            id=ticket["key"],
-            vector={"dense": dense_vector, "sparse": sparse_vector},
-            payload=metadata
-        ))
-
-    # Upsert updated tickets
-    if points:
-        client.upsert(collection_name=COLLECTION_NAME, points=points)
-        print(f"Upserted {len(points)} updated tickets.")
+    # Connect and make sure the collection uses the current sparse encoding
+    client = open_collection()
+    if client is None:
+        return
+    state = open_state(client)
+    try:
+        upserted = apply_tickets(tickets, client, state)
+    finally:
+        state.close()
+    # Only now may the next run treat this export as applied and accept a 304
+    save_validators(XML_FILE, validators)
+
+    if upserted:
+        print(f"Upserted {upserted} updated tickets.")
+        bump_index_version(COLLECTION_NAME)
     else:
         print("No new or updated tickets found.")
 
@@ -1,4 +1,19 @@
 #updater_config.py
 XML_URL = "https://eteamproject.internal.ericsson.com/sr/jira.issueviews:searchrequest-xml/temp/SearchRequest.xml?jqlQuery=project+%3D+%22DE3%22+AND+created+%3E%3D+%222022-03-05%22+ORDER+BY+created+DESC%0A&tempMax=1000"
 SESSION_ID = "DF3A78BDAA35A58890723121FF7ECC45.node2"
-XML_FILE = "SearchRequest_v2.xml"
\ No newline at end of file
+XML_FILE = "SearchRequest_v2.xml"
+# Local change-detection state (ticket key -> updated + content hash)
+STATE_DB = "jira_update_state.sqlite"
+# Export download: (connect, read) timeout in seconds and streaming chunk size
+DOWNLOAD_TIMEOUT = (10, 300)
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Delta sync (delta_sync.py): only tickets updated since the stored watermark are fetched
+XML_EXPORT_URL = "https://eteamproject.internal.ericsson.com/sr/jira.issueviews:searchrequest-xml/temp/SearchRequest.xml"
+SYNC_JQL = 'project = "DE3" AND created >= "2022-03-05"'
+SYNC_PAGE_SIZE = 1000
+# Seconds between runs, +/- a random jitter so several updaters do not hit Jira in step
+SYNC_INTERVAL = 900
+SYNC_JITTER = 60
+# Re-read this many seconds before the watermark to cover clock skew and late commits in Jira
+SYNC_OVERLAP = 600
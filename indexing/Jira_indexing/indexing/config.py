@@ -2,3 +2,9 @@ QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
 COLLECTION_NAME = "jira_tickets_hybrid"
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+
+# Indexing pipeline: tickets per embed/upsert batch, prepared batches queued ahead
+# of the embedder, and upserts allowed in flight at once
+BATCH_SIZE = 100
+PREFETCH_BATCHES = 2
+MAX_IN_FLIGHT_UPSERTS = 2
@@ -0,0 +1,216 @@
+#pipeline.py
+"""
+Producer/consumer indexing pipeline for Jira tickets.
+
+    producer thread:  parse + prepare documents  -> bounded queue of batches
+    calling thread:   batched embedding + sparse vectors + PointStructs
+    upload threads:   client.upsert(wait=False), at most `max_in_flight` at once
+
+Parsing, embedding and network round trips overlap, so a backfill keeps the CPU
+busy embedding. Memory stays flat: at most `prefetch_batches` prepared batches
+wait in the queue and `max_in_flight` batches are being uploaded, whatever the
+size of the export.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from qdrant_client.models import PointStruct
+
+from indexing.utils import embed_batch, generate_sparse_vector
+from indexing.config import BATCH_SIZE, MAX_IN_FLIGHT_UPSERTS, PREFETCH_BATCHES
+from indexing.JiraUpdater.state_store import content_hash
+
+logger = logging.getLogger(__name__)
+
+Batch = List[Tuple[dict, str]]
+_DONE = object()
+
+# Namespace for ticket point ids; uuid5(namespace, key) is the same in every run and on every machine
+TICKET_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://eteamproject.internal.ericsson.com/browse/")
+
+
+def ticket_point_id(key: str) -> str:
+    """Deterministic Qdrant point id of a ticket, shared by the full build and the updater."""
+    return str(uuid.uuid5(TICKET_NAMESPACE, key))
+
+
+def scroll_indexed(client, collection_name: str, page_size: int = 1000) -> Iterator[Tuple[object, dict]]:
+    """
+    Yield (point_id, payload) for every point of the collection, paging through
+    Qdrant without vectors. The payload holds only key/updated/content_hash, the
+    fields the full build and the updater compare tickets against. Ids are kept
+    as Qdrant returns them, so integer ids of older builds can still be deleted.
+    """
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=page_size,
+            offset=offset,
+            with_payload=["key", "updated", "content_hash"],
+            with_vectors=False,
+        )
+        for pt in points:
+            yield pt.id, pt.payload
+        if offset is None:
+            return
+
+
+def prepare_document(ticket: dict) -> str:
+    """
+    Combine key fields for embedding. The full build and the updater both call
+    this, and both compare its `content_hash` against the stored payload, so a
+    change here re-embeds every ticket once.
+    """
+    text_parts = [
+        f"Title: {ticket['title']}",
+        f"Summary: {ticket['summary']}",
+        f"Description: {ticket['description']}",
+        f"Status: {ticket['status']}",
+        f"Resolution: {ticket['resolution'] or 'Unresolved'}",
+    ]
+
+    if ticket["comments"]:
+        text_parts.append("Comments:")
+        text_parts.extend(
+            f"- {c['author']} on {c['created']}: {c['text']}" for c in ticket["comments"]
+        )
+
+    if ticket.get("last_comment"):
+        text_parts.append(f"Last Comment: {ticket['last_comment']}")
+
+    if ticket.get("solution"):
+        text_parts.append(f"Solution: {ticket['solution']}")
+
+    return "\n".join(text_parts)
+
+
+def ticket_payload(ticket: dict, document_text: str) -> dict:
+    return {
+        "key": ticket["key"],
+        "title": ticket["title"],
+        "status": ticket["status"],
+        "resolution": ticket["resolution"],
+        "priority": ticket["priority"],
+        "created": ticket["created"],
+        "updated": ticket["updated"],
+        "has_attachments": len(ticket["attachments"]) > 0,
+        "comment_count": len(ticket["comments"]),
+        "labels": ticket["labels"],
+        "description": ticket["description"],
+        "last_comment": ticket.get("last_comment", ""),
+        "solution": ticket.get("solution", ""),
+        "link": f"https://eteamproject.internal.ericsson.com/browse/{ticket['key']}",
+        # Lets a full build skip tickets whose embedded text has not changed
+        "content_hash": content_hash(document_text),
+    }
+
+
+def _produce(items: Iterable[Tuple[dict, str]], batches: "queue.Queue", batch_size: int, stop: threading.Event):
+    def put(item):
+        # Re-check `stop` so a failed consumer never leaves this thread blocked on a full queue
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        batch: Batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                if not put(batch):
+                    return
+                batch = []
+        if batch and not put(batch):
+            return
+        put(_DONE)
+    except Exception as e:
+        put(e)
+
+
+def run_pipeline(
+    items: Iterable[Tuple[dict, str]],
+    client,
+    collection_name: str,
+    batch_size: int = BATCH_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT_UPSERTS,
+    prefetch_batches: int = PREFETCH_BATCHES,
+    on_batch_done: Optional[Callable[[Batch], None]] = None,
+) -> Dict[str, float]:
+    """
+    Embed and upsert (ticket, document_text) pairs under their `ticket_point_id`.
+    `items` may be a lazy generator; it is consumed on the producer thread.
+    `on_batch_done` runs on the calling thread once a batch has been accepted by
+    Qdrant. Returns ticket counts, timing and throughput.
+    """
+    batches: "queue.Queue" = queue.Queue(maxsize=prefetch_batches)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(items, batches, batch_size, stop), name="jira-parse", daemon=True)
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    pending = []
+    processed = 0
+    started = time.perf_counter()
+
+    def upload(points):
+        try:
+            client.upsert(collection_name=collection_name, points=points, wait=False)
+        finally:
+            in_flight.release()
+
+    def reap(block: bool):
+        # Surface upload errors and run callbacks on this thread, oldest batch first
+        while pending and (block or pending[0][0].done()):
+            future, batch = pending.pop(0)
+            future.result()
+            if on_batch_done:
+                on_batch_done(batch)
+
+    producer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="jira-upsert") as uploader:
+            while True:
+                batch = batches.get()
+                if batch is _DONE:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+
+                dense_vectors = embed_batch([document_text for _, document_text in batch])
+                points = [
+                    PointStruct(
+                        id=ticket_point_id(ticket["key"]),
+                        vector={
+                            "dense": dense_vector.tolist(),
+                            "sparse": generate_sparse_vector(document_text)
+                        },
+                        payload=ticket_payload(ticket, document_text)
+                    )
+                    for (ticket, document_text), dense_vector in zip(batch, dense_vectors)
+                ]
+
+                in_flight.acquire()
+                pending.append((uploader.submit(upload, points), batch))
+                processed += len(batch)
+                reap(block=False)
+
+                elapsed = time.perf_counter() - started
+                logger.info(f"Indexed {processed} tickets ({processed / elapsed:.1f} tickets/s)")
+            reap(block=True)
+    finally:
+        stop.set()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "tickets": processed,
+        "seconds": round(elapsed, 2),
+        "tickets_per_sec": round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+    }
@@ -1,110 +1,119 @@
 from qdrant_client import QdrantClient, models
-from qdrant_client.models import PointStruct, VectorParams, Distance
-from parsers import parse_jira_xml
-from indexing.utils import get_dense_embedding, generate_sparse_vector, clean_html
+from qdrant_client.models import VectorParams, Distance
+from parsers import iter_jira_xml
+from indexing.utils import clean_html, cache_stats
+import logging
 import sys
 import os
 # Add parent directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from indexing.config import QDRANT_HOST, QDRANT_PORT, COLLECTION_NAME
+from indexing.pipeline import prepare_document, run_pipeline, scroll_indexed, ticket_point_id
+from indexing.JiraUpdater.state_store import TicketStateStore, content_hash
+from indexing.JiraUpdater.updater_config import STATE_DB
+from shared.index_version import bump_index_version
 import pandas as pd
 
 EXPORT_PATH= "SearchRequest.xml" 
 
-def prepare_document(ticket: dict) -> str:
-    """Combine key fields for embedding"""
-    text_parts = [
-        f"Title: {ticket['title']}",
-        f"Summary: {ticket['summary']}",
-        f"Description: {ticket['description']}",
-        f"Status: {ticket['status']}",
-        f"Resolution: {ticket['resolution'] or 'Unresolved'}",
-    ]
-
-    if ticket["comments"]:
-        text_parts.append("Comments:")
-        text_parts.extend(
-            f"- {c['author']} on {c['created']}: {c['text']}" for c in ticket["comments"]
-        )
-
-    if ticket.get("last_comment"):
-        text_parts.append(f"Last Comment: {ticket['last_comment']}")
+# The pipeline reports per-batch progress through its logger
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()]
+)
 
-    if ticket.get("solution"):
-        text_parts.append(f"Solution: {ticket['solution']}")
 
-    return "\n".join(text_parts)
+def ensure_collection(client: QdrantClient) -> bool:
+    """
+    Create the hybrid collection if it is missing. A collection without the IDF
+    sparse vector predates the BM25 encoder and cannot be updated in place, so
+    it is the only case that is still dropped and recreated. Returns True when
+    the collection was (re)created empty.
+    """
+    if client.collection_exists(COLLECTION_NAME):
+        sparse_config = (client.get_collection(COLLECTION_NAME).config.params.sparse_vectors or {}).get("sparse")
+        if sparse_config is not None and sparse_config.modifier == models.Modifier.IDF:
+            return False
+        print(f"Recreating {COLLECTION_NAME}: its sparse vector has no IDF modifier")
+        client.delete_collection(COLLECTION_NAME)
 
-
-def index_tickets(xml_path: str):
-    
-    # Parse XML
-    tickets = parse_jira_xml(xml_path)
-    
-    # Initialize Qdrant
-    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
-    
     # Create collection with hybrid support for both dense and sparse vectors
-    client.recreate_collection(
+    client.create_collection(
         collection_name=COLLECTION_NAME,
         vectors_config={
             "dense": VectorParams(size=768, distance=Distance.COSINE),
         },
         sparse_vectors_config={
-            "sparse": models.SparseVectorParams()
+            # Qdrant computes IDF from the collection; documents only store BM25 term weights
+            "sparse": models.SparseVectorParams(modifier=models.Modifier.IDF)
         }
     )
+    return True
+
+
+def index_tickets(xml_path: str):
     
-    # Prepare and index points
-    points = []
-    for idx, ticket in enumerate(tickets):
-        # Prepare text
-        document_text = prepare_document(ticket)
-        
-        # Generate vectors
-        dense_vector = get_dense_embedding(document_text)
-        sparse_vector = generate_sparse_vector(document_text)
-        
-        # Prepare metadata
-        metadata = {
-            "key": ticket["key"],
-            "title": ticket["title"],
-            "status": ticket["status"],
-            "resolution": ticket["resolution"],
-            "priority": ticket["priority"],
-            "created": ticket["created"],
-            "updated": ticket["updated"],
-            "has_attachments": len(ticket["attachments"]) > 0,
-            "comment_count": len(ticket["comments"]),
-            "labels": ticket["labels"],
-            "description": ticket["description"],
-            "last_comment": ticket.get("last_comment", ""),
-            "solution": ticket.get("solution", ""),
-            "link": f"https://eteamproject.internal.ericsson.com/browse/{ticket['key']}",
-        }        
-        points.append(
-            PointStruct(
-                id=idx,
-                vector={
-                    "dense": dense_vector,
-                    "sparse": sparse_vector
-                },
-                payload=metadata
-            )
+    # Tickets are parsed lazily on the pipeline's producer thread as the export is read
+    tickets = iter_jira_xml(xml_path)
+
+    # Initialize Qdrant
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    created = ensure_collection(client)
+    indexed = dict(scroll_indexed(client, COLLECTION_NAME))
+    seen, seen_keys = set(), set()
+
+    # The updater's change-detection state must follow what this build writes and deletes.
+    # An empty store is left empty: the updater seeds it from Qdrant on its next run.
+    state = TicketStateStore(STATE_DB)
+    if created:
+        state.clear()
+    track_state = len(state) > 0
+
+    def changed_tickets():
+        # Same ticket, same `updated` and same embedded text: the stored point is already current
+        for ticket in tickets:
+            point_id = ticket_point_id(ticket["key"])
+            seen.add(point_id)
+            seen_keys.add(ticket["key"])
+            document_text = prepare_document(ticket)
+            payload = indexed.get(point_id, {})
+            if (payload.get("updated"), payload.get("content_hash")) == (ticket["updated"], content_hash(document_text)):
+                continue
+            yield ticket, document_text
+
+    def record_state(batch):
+        state.put_many(
+            (ticket["key"], ticket["updated"], content_hash(document_text))
+            for ticket, document_text in batch
         )
-        
-        # Batch insert every 100 tickets
-        if len(points) % 100 == 0:
-            client.upsert(collection_name=COLLECTION_NAME, points=points)
-            points = []
-            print(f"Indexed {idx+1} tickets...")
-    
-    # Insert remaining points
-    if points:
-        client.upsert(collection_name=COLLECTION_NAME, points=points)
-    
-    print(f"Successfully indexed {len(tickets)} tickets")
+
+    try:
+        # Parse, embed and upsert in overlapping stages, BATCH_SIZE tickets at a time
+        stats = run_pipeline(changed_tickets(), client, COLLECTION_NAME, on_batch_done=record_state if track_state else None)
+
+        # Points of tickets missing from this export, including ids from older index layouts
+        stale = [point_id for point_id in indexed if point_id not in seen]
+        for start in range(0, len(stale), 1000):
+            client.delete(
+                collection_name=COLLECTION_NAME,
+                points_selector=models.PointIdsList(points=stale[start:start + 1000]),
+            )
+        if track_state:
+            # A legacy point of a ticket that is still exported was replaced, not removed
+            state.delete_many(
+                indexed[point_id]["key"] for point_id in stale
+                if "key" in indexed[point_id] and indexed[point_id]["key"] not in seen_keys
+            )
+    finally:
+        state.close()
+
+    print(f"Indexed {stats['tickets']} new or changed tickets in {stats['seconds']}s ({stats['tickets_per_sec']} tickets/s)")
+    print(f"{len(seen) - stats['tickets']} tickets unchanged, {len(stale)} stale points deleted")
+    if stats["tickets"] or stale:
+        bump_index_version(COLLECTION_NAME)
+    print(f"Embedding cache: {cache_stats()}")
 
 if __name__ == "__main__":
     index_tickets(EXPORT_PATH)
\ No newline at end of file
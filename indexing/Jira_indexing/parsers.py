@@ -1,65 +1,93 @@
 import xml.etree.ElementTree as ET
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime
 from  indexing.utils  import clean_html
 
-def parse_jira_xml(file_path: str) -> List[Dict]:
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    tickets = []
 
-    for item in root.findall(".//item"):
-        key = item.findtext("key")
-        title = item.findtext("title")
-        if not key or not title:
-            continue
-        # Core metadata
-        ticket = {
-            "key": item.findtext("key"),
-            "title": item.findtext("title"),
-            "summary": item.findtext("summary"),
-            "description": clean_html(item.findtext("description")),
-            "status": item.findtext("status"),
-            "resolution": item.findtext("resolution"),
-            "priority": item.find("priority").get("id") if item.find("priority") else None,
-            "created": item.findtext("created"),
-            "updated": item.findtext("updated"),
-            "labels": [label.text for label in item.findall("labels/label")],
-            "reporter": item.find("reporter").get("username") if item.find("reporter") else None,
-            "assignee": item.find("assignee").get("username") if item.find("assignee") else None,
-        }
+def _child_attr(item: ET.Element, tag: str, attr: str) -> Optional[str]:
+    # Compare with None: an element without children is falsy even when it exists
+    child = item.find(tag)
+    return child.get(attr) if child is not None else None
 
-        # Parse comments
-        ticket["comments"] = [
-            {
-                "author": comment.get("author"),
-                "created": comment.get("created"),
-                "text": clean_html(comment.text)
-            }
-            for comment in item.findall("comments/comment")
-        ]
 
-        # Parse attachments
-        ticket["attachments"] = [
-            {
-                "id": attach.get("id"),
-                "name": attach.get("name"),
-                "url": f"https://eteamproject.internal.ericsson.com/secure/attachment/{attach.get('id')}/{attach.get('name')}"
-            }
-            for attach in item.findall("attachments/attachment")
-        ]
+def parse_item(item: ET.Element) -> Optional[Dict]:
+    """Build the ticket dict of one <item>, or None when it has no key or title."""
+    key = item.findtext("key")
+    title = item.findtext("title")
+    if not key or not title:
+        return None
+    # Core metadata
+    ticket = {
+        "key": key,
+        "title": title,
+        "summary": item.findtext("summary"),
+        "description": clean_html(item.findtext("description")),
+        "status": item.findtext("status"),
+        "resolution": item.findtext("resolution"),
+        "priority": _child_attr(item, "priority", "id"),
+        "created": item.findtext("created"),
+        "updated": item.findtext("updated"),
+        "labels": [label.text for label in item.findall("labels/label")],
+        "reporter": _child_attr(item, "reporter", "username"),
+        "assignee": _child_attr(item, "assignee", "username"),
+    }
 
-        # Parse custom fields
-        custom_fields = {
-            field.findtext("customfieldname"): clean_html(
-                field.findtext("customfieldvalues/customfieldvalue")
-            )
-            for field in item.findall("customfields/customfield")
+    # Parse comments
+    ticket["comments"] = [
+        {
+            "author": comment.get("author"),
+            "created": comment.get("created"),
+            "text": clean_html(comment.text)
         }
-        ticket["custom_fields"] = custom_fields
-        ticket["last_comment"] = custom_fields.get("Last Comment Body") or custom_fields.get("Last Comment", "")
-        ticket["solution"] = custom_fields.get("Solution") or ""
+        for comment in item.findall("comments/comment")
+    ]
+
+    # Parse attachments
+    ticket["attachments"] = [
+        {
+            "id": attach.get("id"),
+            "name": attach.get("name"),
+            "url": f"https://eteamproject.internal.ericsson.com/secure/attachment/{attach.get('id')}/{attach.get('name')}"
+        }
+        for attach in item.findall("attachments/attachment")
+    ]
+
+    # Parse custom fields
+    custom_fields = {
+        field.findtext("customfieldname"): clean_html(
+            field.findtext("customfieldvalues/customfieldvalue")
+        )
+        for field in item.findall("customfields/customfield")
+    }
+    ticket["custom_fields"] = custom_fields
+    ticket["last_comment"] = custom_fields.get("Last Comment Body") or custom_fields.get("Last Comment", "")
+    ticket["solution"] = custom_fields.get("Solution") or ""
+
+    return ticket
 
-        tickets.append(ticket)
-    
-    return tickets
\ No newline at end of file
+
+def iter_jira_xml(file_path: str) -> Iterator[Dict]:
+    """
+    Yield tickets one at a time while the export is read. Each <item> is parsed
+    when its end tag arrives and then removed from the tree, so memory stays at
+    roughly one ticket however large the export is.
+    """
+    path = []
+    for event, elem in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            path.append(elem)
+            continue
+        path.pop()
+        if elem.tag != "item":
+            continue
+        ticket = parse_item(elem)
+        if ticket is not None:
+            yield ticket
+        # Drop the finished item from its parent as well, or the channel keeps every empty shell
+        elem.clear()
+        if path:
+            path[-1].remove(elem)
+
+
+def parse_jira_xml(file_path: str) -> List[Dict]:
+    return list(iter_jira_xml(file_path))
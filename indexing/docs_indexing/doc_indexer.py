@@ -1,15 +1,16 @@
 import json
 from uuid import uuid4
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, VectorParams, Distance
+from qdrant_client.http.models import PointStruct, VectorParams, Distance, PayloadSchemaType
 
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-from utils import get_embedding
+from utils import embed_batch, cache_stats
 from config import QDRANT_HOST, QDRANT_PORT, COLLECTION_NAME
+from shared.index_version import bump_index_version
 
 class UserManualIndexer:
     def __init__(self, data_path: str, vector_size: int = 768):
@@ -25,6 +26,16 @@ class UserManualIndexer:
             vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE)
         )
         print(f" Collection `{self.collection}` created.")
+        self.create_payload_indexes()
+
+    def create_payload_indexes(self):
+        # The retriever restricts its search to boosted sections with a filter on section_id
+        self.client.create_payload_index(
+            collection_name=self.collection,
+            field_name="section_id",
+            field_schema=PayloadSchemaType.KEYWORD
+        )
+        print(" Keyword index on `section_id` created.")
 
     def load_sections(self):
         with open(self.data_path, 'r', encoding='utf-8') as f:
@@ -32,8 +43,8 @@ class UserManualIndexer:
 
     def build_points(self, sections):
         points = []
-        for node in sections:
-            vector = get_embedding(node['text'])
+        vectors = embed_batch([node['text'] for node in sections])
+        for node, vector in zip(sections, vectors):
             payload = {
                 "id": node.get("id"),
                 "section_id": node.get("id"),
@@ -44,7 +55,7 @@ class UserManualIndexer:
                 "children_ids": node.get("children_ids", []),
                 "text": node.get("text"),
             }
-            points.append(PointStruct(id=str(uuid4()), vector=vector, payload=payload))
+            points.append(PointStruct(id=str(uuid4()), vector=vector.tolist(), payload=payload))
         return points
 
     def upsert_points(self, points):
@@ -55,5 +66,7 @@ class UserManualIndexer:
         self.recreate_collection()
         sections = self.load_sections()
         points = self.build_points(sections)
+        print(f" Embedding cache: {cache_stats()}")
         self.upsert_points(points)
+        bump_index_version(self.collection)
         
@@ -1,20 +1,14 @@
 
 #utils.py
-from transformers import AutoTokenizer, AutoModel
-import torch
+import os
+import sys
 
-model_name = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModel.from_pretrained(model_name)
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-def mean_pooling(model_output, attention_mask):
-    token_embeddings = model_output[0]
-    input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-    return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
+from shared.embedding_service import embed, embed_batch, cache_stats
 
 
-def get_embedding(text, tokenizer=tokenizer, model=model):
-    inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-    with torch.no_grad():
-        model_output = model(**inputs)
-    return mean_pooling(model_output, inputs['attention_mask']).squeeze().tolist()
\ No newline at end of file
+def get_embedding(text):
+    return embed(text).tolist()
@@ -0,0 +1,73 @@
+#config.py
+import os
+
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+EMBEDDING_DIM = 768
+EMBEDDING_MAX_LENGTH = 512
+EMBEDDING_BATCH_SIZE = 32
+
+# On-disk embedding cache shared by every process on this machine
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = 100_000
+# Keys per "WHERE key IN (...)" statement in the SQLite stores (embedding cache,
+# Jira update state); stays well below SQLite's bound-parameter limit
+SQLITE_QUERY_CHUNK = 500
+
+# Encoder backend: "torch", "onnx" or "onnx-int8"
+EMBEDDING_BACKEND = "torch"
+ONNX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "onnx")
+# Minimum cosine similarity to the torch embeddings an ONNX export must reach on the probe sentences
+ONNX_MIN_COSINE = 0.98
+
+# Jira cross-encoder reranker: backend ("torch", "onnx" or "onnx-int8"),
+# pairs per forward pass and number of cached (query, ticket) scores
+RERANKER_BACKEND = "torch"
+RERANKER_BATCH_SIZE = 16
+RERANKER_CACHE_SIZE = 4096
+
+# Multi-source retrieval: per-source deadlines in seconds for the concurrent retriever calls.
+# The Jira path includes a HyDE LLM call, so it gets the longer budget.
+SOURCE_TIMEOUTS = {"cap_manual_v3": 10.0, "jira_tickets_hybrid": 30.0}
+DEFAULT_SOURCE_TIMEOUT = 20.0
+
+# LLM endpoints: Ollama server and HTTP timeouts in seconds (connect, read)
+OLLAMA_BASE_URL = "http://localhost:11434"
+LLM_CONNECT_TIMEOUT = 5.0
+LLM_READ_TIMEOUT = 120.0
+# Ollama client: pooled connections, retries on connection errors and 429/5xx with
+# exponential backoff, and how long Ollama keeps the model loaded after a request
+OLLAMA_POOL_SIZE = 10
+OLLAMA_MAX_RETRIES = 2
+OLLAMA_RETRY_BACKOFF = 0.5
+OLLAMA_KEEP_ALIVE = "30m"
+
+# HyDE query expansion: cached vectors per normalized question, how long a Jira
+# query waits for HyDE before using the plain-query search, and the hard cap on
+# the Ollama generation itself (a late answer still lands in the cache)
+HYDE_CACHE_SIZE = 1024
+HYDE_CACHE_TTL = 3600.0
+HYDE_DEADLINE = 4.0
+HYDE_GENERATION_TIMEOUT = 30.0
+# Concurrent HyDE generations per Jira retriever; beyond that new queries skip HyDE
+HYDE_MAX_CONCURRENT = 4
+# HyDE generation limits: token budget and stop sequences. Reasoning is disabled
+# with Ollama's `think` flag and any leftover <think> block is stripped before embedding.
+HYDE_NUM_PREDICT = 160
+HYDE_STOP = ["\n\n\n", "Question:"]
+
+# Semantic answer cache: a new question reuses a cached answer for the same source
+# and model when their query embeddings reach this cosine similarity. Entries are
+# also dropped when a collection they were answered from is reindexed.
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_THRESHOLD = 0.95
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = 24 * 3600.0
+INDEX_VERSION_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "index_versions.json")
+
+# Jira sparse vectors: BM25 term-frequency saturation (k1) and length normalization (b)
+# against the approximate mean token count of a prepared ticket document. IDF is
+# applied by Qdrant (Modifier.IDF on the "sparse" vector).
+SPARSE_BM25_K1 = 1.2
+SPARSE_BM25_B = 0.75
+SPARSE_AVG_DOC_LENGTH = 250
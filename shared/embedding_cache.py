@@ -0,0 +1,124 @@
+# shared/embedding_cache.py
+"""
+Persistent, content-addressed embedding cache.
+
+Vectors are stored in a single SQLite file keyed by (model name, truncation
+settings, sha256 of the text). The cache is bounded by an entry count and evicts
+the least recently used vectors once the cap is exceeded.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from shared.config import SQLITE_QUERY_CHUNK
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_entries: int, dim: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_access INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> str:
+        return f"{namespace}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, np.ndarray] = {}
+        now = time.time_ns()
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_QUERY_CHUNK):
+                chunk = keys[start:start + SQLITE_QUERY_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                if rows:
+                    self._touch([key for key, _ in rows], now)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _touch(self, keys: List[str], now: int) -> None:
+        # LRU bookkeeping is best-effort: a writer in another process holding the
+        # file (e.g. an indexer) must neither fail nor stall the embedding request
+        timeout_ms = self._conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        self._conn.execute("PRAGMA busy_timeout=0")
+        try:
+            self._conn.execute(
+                f"UPDATE embeddings SET last_access = ? WHERE key IN ({','.join('?' * len(keys))})",
+                [now] + keys,
+            )
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Skipped last_access update for {len(keys)} cached embeddings: {e}")
+        finally:
+            self._conn.execute(f"PRAGMA busy_timeout={int(timeout_ms)}")
+
+    def put_many(self, items: Iterable[Tuple[str, np.ndarray]]) -> None:
+        now = time.time_ns()
+        rows: List[Tuple[str, bytes, int]] = [
+            (key, np.ascontiguousarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+                )
+                self._entries += self._conn.total_changes - before
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Other processes may share the file, so recount before deleting
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._entries - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN"
+            " (SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (excess,),
+        )
+        self._entries -= excess
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._entries}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,282 @@
+# shared/embedding_service.py
+"""
+Process-wide embedding service used by indexing, generation and evaluation.
+
+The mpnet model is loaded lazily on first use and shared by every caller in the
+process, so importing the retriever and the Jira utils together holds a single
+copy of the weights. All callers get the same truncation settings.
+
+Vectors are looked up in the on-disk EmbeddingCache before the model runs, so
+text that was embedded in any earlier run is never encoded again.
+
+EMBEDDING_BACKEND selects how the encoder runs: eager PyTorch ("torch"), an ONNX
+export served by ONNX Runtime ("onnx") or its int8-quantized variant
+("onnx-int8"). ONNX models are exported on first use and only kept if their
+embeddings agree with the torch backend on a set of probe sentences. If the
+export or that check fails, the error is logged once and the process keeps
+embedding with torch.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+from shared.config import (
+    EMBEDDING_MODEL, EMBEDDING_DIM, EMBEDDING_MAX_LENGTH, EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_BACKEND, ONNX_DIR, ONNX_MIN_COSINE,
+)
+from shared.embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Sentences used to check that an ONNX export reproduces the torch embeddings
+PROBE_TEXTS = [
+    "How do I create a new automation workflow in the portal?",
+    "Build fails with a timeout during deployment to the staging cluster.",
+    "Wie kann ich mein Passwort zurücksetzen?",
+    "Error",
+    "The pipeline run stays in the pending state and no logs are produced for the job, "
+    "even after the runner was restarted and the configuration was validated.",
+]
+
+_lock = threading.RLock()
+_tokenizer = None
+_model = None
+_onnx_session = None
+_onnx_error = None
+_cache = None
+
+
+def get_tokenizer():
+    global _tokenizer
+    if _tokenizer is None:
+        with _lock:
+            if _tokenizer is None:
+                _tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+    return _tokenizer
+
+
+def get_model():
+    """Return the shared (tokenizer, torch model) pair, loading it on first use."""
+    global _model
+    tokenizer = get_tokenizer()
+    if _model is None:
+        with _lock:
+            if _model is None:
+                model = AutoModel.from_pretrained(EMBEDDING_MODEL)
+                model.eval()
+                _model = model
+    return tokenizer, _model
+
+
+def onnx_model_path(backend: str) -> str:
+    filename = "model.int8.onnx" if backend == "onnx-int8" else "model.onnx"
+    return os.path.join(ONNX_DIR, EMBEDDING_MODEL.replace("/", "__"), filename)
+
+
+def get_onnx_session(backend: str = EMBEDDING_BACKEND):
+    """
+    Return the shared ONNX Runtime session, exporting and checking the model on
+    first use. A failed export or agreement check is remembered and re-raised on
+    later calls without trying again.
+    """
+    global _onnx_session, _onnx_error
+    if _onnx_session is None:
+        with _lock:
+            if _onnx_error is not None:
+                raise _onnx_error
+            if _onnx_session is None:
+                try:
+                    _onnx_session = _load_onnx_session(backend)
+                except Exception as e:
+                    _onnx_error = e
+                    logger.error(f"{backend} embedding backend unavailable, falling back to torch: {e}")
+                    raise
+    return _onnx_session
+
+
+def resolve_backend() -> str:
+    """The backend embeddings are computed with: EMBEDDING_BACKEND, or "torch" if its ONNX model failed."""
+    if EMBEDDING_BACKEND == "torch":
+        return "torch"
+    try:
+        get_onnx_session(EMBEDDING_BACKEND)
+    except Exception:
+        return "torch"
+    return EMBEDDING_BACKEND
+
+
+def _load_onnx_session(backend: str):
+    from shared.onnx_backend import OnnxSession, export_onnx, quantize_int8
+
+    path = onnx_model_path(backend)
+    if os.path.exists(path) and os.path.exists(path + ".check.json"):
+        return OnnxSession(path)
+
+    # The torch model is only needed to export and check the ONNX model, so it is
+    # loaded locally and released afterwards instead of becoming the shared model
+    reference_model = AutoModel.from_pretrained(EMBEDDING_MODEL).eval()
+    fp32_path = onnx_model_path("onnx")
+    if not os.path.exists(fp32_path):
+        logger.info(f"Exporting {EMBEDDING_MODEL} to ONNX at {fp32_path}")
+        export_onnx(reference_model, get_tokenizer(), fp32_path)
+    candidate = fp32_path
+    if backend == "onnx-int8":
+        logger.info(f"Quantizing {fp32_path} to int8")
+        candidate = path + ".candidate"
+        quantize_int8(fp32_path, candidate)
+
+    session = OnnxSession(candidate)
+    min_cosine = check_backend_agreement(session, reference_model)
+    if min_cosine < ONNX_MIN_COSINE:
+        if candidate != fp32_path:
+            os.remove(candidate)
+        raise RuntimeError(
+            f"{backend} embeddings disagree with torch (min cosine {min_cosine:.4f} < {ONNX_MIN_COSINE})"
+        )
+    if candidate != path:
+        os.replace(candidate, path)
+        session = OnnxSession(path)
+    with open(path + ".check.json", "w", encoding="utf-8") as f:
+        json.dump({"backend": backend, "min_cosine": min_cosine, "probes": len(PROBE_TEXTS)}, f, indent=2)
+    logger.info(f"{backend} backend agrees with torch: min cosine {min_cosine:.4f}")
+    return session
+
+
+def check_backend_agreement(session, reference_model=None, texts: Sequence[str] = PROBE_TEXTS) -> float:
+    """Smallest cosine similarity between torch and ONNX embeddings of `texts`."""
+    texts = list(texts)
+    reference = _encode(texts, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_LENGTH, backend="torch", model=reference_model)
+    candidate = _encode(texts, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_LENGTH, backend="onnx", session=session)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosines = np.sum(reference * candidate, axis=1) / np.maximum(norms, 1e-12)
+    return float(cosines.min())
+
+
+def get_cache() -> Optional[EmbeddingCache]:
+    """Return the shared embedding cache, or None when caching is disabled."""
+    global _cache
+    if EMBEDDING_CACHE_ENABLED and _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_DIM)
+    return _cache
+
+
+def cache_stats() -> Dict[str, int]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
+
+
+def mean_pooling(model_output, attention_mask):
+    token_embeddings = model_output[0]
+    input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
+    return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
+
+
+def _mean_pooling_np(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    mask = attention_mask[..., None].astype(np.float32)
+    return (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+def embed(texts: Union[str, Sequence[str]], max_length: int = EMBEDDING_MAX_LENGTH) -> np.ndarray:
+    """
+    Embed one text or a sequence of texts.
+
+    Returns a float32 vector of shape (EMBEDDING_DIM,) for a single string and a
+    matrix of shape (len(texts), EMBEDDING_DIM) for a sequence.
+    """
+    if isinstance(texts, str):
+        return embed_batch([texts], max_length=max_length)[0]
+    return embed_batch(texts, max_length=max_length)
+
+
+def embed_batch(
+    texts: Sequence[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_length: int = EMBEDDING_MAX_LENGTH,
+) -> np.ndarray:
+    """
+    Embed many texts with as few forward passes as possible.
+
+    Inputs are tokenized once, sorted by token length and grouped into batches
+    of `batch_size`, so each batch is padded only to its own longest member.
+    Returns a contiguous float32 matrix of shape (len(texts), EMBEDDING_DIM) in
+    the original input order.
+    """
+    texts: List[str] = list(texts)
+    vectors = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    if not texts:
+        return vectors
+
+    backend = resolve_backend()
+    cache = get_cache()
+    if cache is None:
+        vectors[:] = _encode(texts, batch_size, max_length, backend=backend)
+        return vectors
+
+    # Keyed by the backend actually used, so torch fallback vectors never pose as ONNX ones
+    namespace = f"{EMBEDDING_MODEL}|max_length={max_length}"
+    if backend != "torch":
+        namespace += f"|{backend}"
+    keys = [cache.make_key(namespace, text) for text in texts]
+    cached = cache.get_many(keys)
+
+    # Encode each distinct uncached text once, even if it repeats in the input
+    missing = {}
+    for row, key in enumerate(keys):
+        if key in cached:
+            vectors[row] = cached[key]
+        else:
+            missing.setdefault(key, []).append(row)
+
+    if missing:
+        first_rows = [rows[0] for rows in missing.values()]
+        encoded = _encode([texts[row] for row in first_rows], batch_size, max_length, backend=backend)
+        for (key, rows), vector in zip(missing.items(), encoded):
+            vectors[rows] = vector
+        cache.put_many(zip(missing.keys(), encoded))
+    return vectors
+
+
+def _encode(
+    texts: List[str],
+    batch_size: int,
+    max_length: int,
+    backend: str = EMBEDDING_BACKEND,
+    session=None,
+    model=None,
+) -> np.ndarray:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend}. Must be one of {BACKENDS}.")
+
+    vectors = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    tokenizer = get_tokenizer()
+    encoded = tokenizer(texts, truncation=True, max_length=max_length)
+    order = sorted(range(len(texts)), key=lambda i: len(encoded["input_ids"][i]))
+
+    if backend == "torch" and model is None:
+        _, model = get_model()
+    elif backend != "torch" and session is None:
+        session = get_onnx_session(backend)
+
+    for start in range(0, len(order), batch_size):
+        rows = order[start:start + batch_size]
+        features = {name: [values[i] for i in rows] for name, values in encoded.items()}
+        if backend == "torch":
+            inputs = tokenizer.pad(features, return_tensors="pt")
+            with torch.no_grad():
+                model_output = model(**inputs)
+            vectors[rows] = mean_pooling(model_output, inputs["attention_mask"]).numpy()
+        else:
+            inputs = tokenizer.pad(features, return_tensors="np")
+            vectors[rows] = _mean_pooling_np(session(inputs), inputs["attention_mask"])
+    return vectors
@@ -0,0 +1,50 @@
+# shared/index_version.py
+"""
+Per-collection index version tokens, persisted in a small JSON file.
+
+Indexers and updaters call `bump_index_version` after writing to a collection;
+caches record `get_index_version` with each entry and treat a changed token as
+stale. The file is only re-read when its modification time changes, so checking
+a version on every request costs one stat call.
+"""
+import json
+import os
+import threading
+import uuid
+from typing import Dict
+
+from shared.config import INDEX_VERSION_PATH
+
+_lock = threading.Lock()
+_cached = {"mtime": None, "versions": {}}
+
+
+def _read(path: str) -> Dict[str, str]:
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if mtime != _cached["mtime"]:
+        with open(path, "r", encoding="utf-8") as f:
+            _cached["versions"] = json.load(f)
+        _cached["mtime"] = mtime
+    return _cached["versions"]
+
+
+def get_index_version(collection: str, path: str = INDEX_VERSION_PATH) -> str:
+    """Current version token of `collection`; "0" until it is first bumped."""
+    with _lock:
+        return _read(path).get(collection, "0")
+
+
+def bump_index_version(collection: str, path: str = INDEX_VERSION_PATH) -> str:
+    """Give `collection` a new version token, invalidating answers cached against it."""
+    with _lock:
+        versions = dict(_read(path))
+        versions[collection] = uuid.uuid4().hex
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(versions, f, indent=2)
+        os.replace(tmp_path, path)
+        return versions[collection]
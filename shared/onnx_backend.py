@@ -0,0 +1,87 @@
+# shared/onnx_backend.py
+"""
+ONNX Runtime backend for the Hugging Face encoders used in this project.
+
+Models are exported once with torch.onnx.export, optionally quantized to int8
+with dynamic quantization, and then served by a CPU InferenceSession. onnxruntime
+is imported lazily so the torch backends keep working without it installed.
+"""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+
+class _FirstOutput(torch.nn.Module):
+    """Call a Hugging Face model with positional tensors and return only its first output."""
+
+    def __init__(self, model, input_names: List[str]):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        return self.model(**dict(zip(self.input_names, inputs)), return_dict=False)[0]
+
+
+def export_onnx(model, tokenizer, path: str, output_axes: Optional[Dict[int, str]] = None, opset: int = 17) -> None:
+    """
+    Export `model` to ONNX at `path` with dynamic batch and sequence axes.
+
+    The input names are whatever the tokenizer produces (input_ids, attention_mask
+    and, for BERT-style models, token_type_ids). Only the first model output
+    (hidden states or logits) is exported, under the name "output".
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sample = tokenizer(["export sample", "a second, longer export sample"], padding=True, return_tensors="pt")
+    input_names: List[str] = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["output"] = output_axes or {0: "batch", 1: "sequence"}
+
+    tmp_path = path + ".tmp"
+    wrapper = _FirstOutput(model, input_names).eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            tuple(sample[name] for name in input_names),
+            tmp_path,
+            input_names=input_names,
+            output_names=["output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False,
+        )
+    os.replace(tmp_path, path)
+
+
+def quantize_int8(src_path: str, dst_path: str) -> None:
+    """Write a dynamically int8-quantized copy of the ONNX model at `src_path`."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    tmp_path = dst_path + ".tmp"
+    quantize_dynamic(src_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, dst_path)
+
+
+class OnnxSession:
+    """Thin wrapper around an onnxruntime CPU session that accepts tokenizer output."""
+
+    def __init__(self, path: str, intra_op_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        feeds = {
+            name: np.asarray(values, dtype=np.int64)
+            for name, values in features.items()
+            if name in self.input_names
+        }
+        return self.session.run(["output"], feeds)[0]
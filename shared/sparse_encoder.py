@@ -0,0 +1,55 @@
+# shared/sparse_encoder.py
+"""
+Sparse lexical encoder for the Jira hybrid collection.
+
+Each term is mapped to a stable id by hashing it into a fixed 32-bit space, so
+the same term gets the same index in every document, every update run and every
+query without a vocabulary file. Documents carry BM25 term-frequency weights;
+queries carry a weight of 1 per distinct term. The collection's sparse vector
+uses Qdrant's IDF modifier, so the dot product Qdrant computes is BM25.
+"""
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, List
+
+from shared.config import SPARSE_BM25_K1, SPARSE_BM25_B, SPARSE_AVG_DOC_LENGTH
+
+# Words of 3+ characters, as the original encoder used
+_TOKEN_PATTERN = re.compile(r"\w{3,}")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def term_id(term: str) -> int:
+    """Stable 32-bit index of `term` (Qdrant sparse indices are uint32)."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _to_sparse(weights: Dict[str, float]) -> Dict[str, list]:
+    # Two terms hashing to the same id share one dimension; Qdrant requires unique indices
+    merged: Dict[int, float] = {}
+    for term, weight in weights.items():
+        idx = term_id(term)
+        merged[idx] = merged.get(idx, 0.0) + weight
+    return {"indices": list(merged.keys()), "values": list(merged.values())}
+
+
+def encode_document(
+    text: str,
+    k1: float = SPARSE_BM25_K1,
+    b: float = SPARSE_BM25_B,
+    avg_doc_length: float = SPARSE_AVG_DOC_LENGTH,
+) -> Dict[str, list]:
+    """BM25 term-frequency weights of a document, without IDF."""
+    tokens = tokenize(text)
+    term_freq = Counter(tokens)
+    norm = k1 * (1 - b + b * len(tokens) / avg_doc_length)
+    return _to_sparse({term: tf * (k1 + 1) / (tf + norm) for term, tf in term_freq.items()})
+
+
+def encode_query(text: str) -> Dict[str, list]:
+    """One unit weight per distinct query term; Qdrant multiplies in the IDF."""
+    return _to_sparse({term: 1.0 for term in set(tokenize(text))})